@@ -1,50 +1,75 @@
 """Full-feature backend (couple-based) restored, integrating advanced CORS and new Netlify domain."""
 
-import os, re, secrets, string, datetime as dt
+import os, re, json, time, hashlib, mimetypes, secrets, string, datetime as dt
 from uuid import uuid4
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request, send_from_directory
+from urllib.parse import urlencode
+from flask import Flask, Response, g, jsonify, make_response, request, send_from_directory, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient
+from pymongo import ReturnDocument, InsertOne, UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from bson.objectid import ObjectId
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.utils import safe_join
 from flask_jwt_extended import (
     JWTManager, create_access_token, jwt_required, get_jwt_identity
 )
 
+from models.models import Activity, Reminder, Restaurant, WishlistItem
+from services.cache import TTLCache
+from services.compression import Compressor
+from services.filters import FilterError, parse_filters, parse_sort
+from services.json_provider import FastJSONProvider
+from services.media import MediaPipeline
+from services.metrics import Metrics
+from services.mongo import Mongo, client_options
+from services.pagination import fetch_page
+from services.passwords import HasherBusy, PasswordHasher
+from services.pubsub import CoupleBroker
+from services.scheduler import ReminderScheduler
+from services.search import has_term, query_terms, snippet
+from services.push_queue import PushDispatcher
+
 # ───────── Boot ─────────
 load_dotenv()
 app = Flask(__name__)
 app.url_map.strict_slashes = False
+app.json = FastJSONProvider(app, engine=os.getenv("JSON_ENGINE", "orjson"))
 
 # JWT
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "change-me")
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = dt.timedelta(days=30)
 jwt = JWTManager(app)
 
-# Mongo (support multiple env var names)
+# Mongo (support multiple env var names). The client opens lazily in each worker
+# process, after gunicorn forks; pool and compression settings come from MONGO_*.
 MONGODB_URI = os.getenv("MONGODB_URI") or os.getenv("MONGO_URI") or "mongodb://127.0.0.1:27017/"
 MONGODB_DB  = os.getenv("MONGODB_DB", "us_app")
-client = MongoClient(MONGODB_URI)
-db = client[MONGODB_DB]
+metrics = Metrics()
+mongo = Mongo(MONGODB_URI, MONGODB_DB, listeners=metrics.listeners(), **client_options())
+mongo.pool_stats.observers.append(metrics.observe_pool_wait)
 
 # Collections
-users_col       = db["users"]
-couples_col     = db["couples"]
-reminders_col   = db["reminders"]
-restaurants_col = db["restaurants"]
-activities_col  = db["activities"]
-wishlist_col    = db["wishlist_items"]
-photos_col      = db["photos"]
-albums_col      = db["albums"]
-memories_col    = db["memories"]
-comments_col    = db["comments"]
-reactions_col   = db["reactions"]
-settings_col    = db["settings"]
-notes_col       = db["notes"]
-push_subs_col   = db["push_subscriptions"]
+users_col       = mongo.collection("users")
+couples_col     = mongo.collection("couples")
+reminders_col   = mongo.collection("reminders")
+restaurants_col = mongo.collection("restaurants")
+activities_col  = mongo.collection("activities")
+wishlist_col    = mongo.collection("wishlist_items")
+photos_col      = mongo.collection("photos")
+albums_col      = mongo.collection("albums")
+memories_col    = mongo.collection("memories")
+comments_col    = mongo.collection("comments")
+reactions_col   = mongo.collection("reactions")
+reaction_counts_col = mongo.collection("reaction_counts")
+settings_col    = mongo.collection("settings")
+notes_col       = mongo.collection("notes")
+push_subs_col   = mongo.collection("push_subscriptions")
+versions_col    = mongo.collection("collection_versions")
+tombstones_col  = mongo.collection("tombstones")
+upload_refs_col = mongo.collection("upload_refs")
 
 # CORS advanced (new Netlify domain + optional previews)
 _fallback_origins = "https://dreamy-kitten-9d113d.netlify.app,http://localhost:3000,https://us-app-c88e.vercel.app/"
@@ -59,11 +84,27 @@ CORS(
         "origins": origins,
         "methods": ["GET","POST","PUT","DELETE","OPTIONS"],
         "allow_headers": ["Content-Type","Authorization","X-Requested-With"],
+        "expose_headers": ["X-Next-Cursor","Link","ETag"],
         "supports_credentials": False
     }},
     vary_header=True, intercept_exceptions=True, always_send=True
 )
 
+# Prometheus scrape at /metrics (METRICS_TOKEN, when set, is required as a Bearer token)
+metrics.init_app(app, token=os.getenv("METRICS_TOKEN") or None)
+
+# gzip/brotli for JSON above COMPRESS_MIN_SIZE bytes; list routes cache the compressed
+# body under couple + ETag (set by @conditional), so unchanged polls are not recompressed
+compressor = Compressor(
+    min_size=int(os.getenv("COMPRESS_MIN_SIZE", "1024")),
+    gzip_level=int(os.getenv("COMPRESS_GZIP_LEVEL", "6")),
+    br_level=int(os.getenv("COMPRESS_BR_LEVEL", "5")),
+    cache_size=int(os.getenv("COMPRESS_CACHE_SIZE", "256")),
+    cache_ttl=float(os.getenv("COMPRESS_CACHE_TTL", "300")),
+)
+if os.getenv("COMPRESS", "true").lower() in ("1","true","yes"):
+    compressor.init_app(app, cache_key=lambda: g.get("compress_key"))
+
 @app.route("/api/<path:_any>", methods=["OPTIONS"])
 def cors_preflight(_any):
     return ("", 204)
@@ -89,6 +130,129 @@ def iso_to_dt(val):
         return dt.datetime.fromisoformat(s)
     except: return None
 
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX     = int(os.getenv("PAGE_SIZE_MAX", "200"))
+# `?all=1` lists are streamed from the cursor as a chunked JSON array, LIST_STREAM_BATCH
+# documents per Mongo batch and per encoded chunk, instead of being built in memory.
+LIST_STREAM       = os.getenv("LIST_STREAM", "true").lower() in ("1","true","yes")
+LIST_STREAM_BATCH = int(os.getenv("LIST_STREAM_BATCH", "200"))
+
+# Fields left out of list, bootstrap and sync responses: only the couple id (the caller
+# already knows it) and, on reminders, the scheduler's fire lease. Documents are otherwise
+# returned whole, since the frontend edits items straight from the list data.
+LIST_PROJECTION  = {"couple_id": 0}
+LIST_PROJECTIONS = {"reminders": {"couple_id": 0, "fire_lease": 0}}
+
+# Server-side ?<field>=a,b filters and ?sort=[-]field per list route, validated against
+# the model enums. Migration 7 indexes couple_id + one filter + the route's default sort,
+# each extra sort on its own, and reminders status + due_date. Other combinations (two
+# filters, or a filter with another sort) use the closest of those indexes, then filter
+# or sort the remaining documents of that couple in memory.
+LIST_FILTERS = {
+    "reminders":      {"status": Reminder.STATUSES, "priority": Reminder.PRIORITIES, "assigned_to": str},
+    "restaurants":    {"status": Restaurant.STATUSES},
+    "activities":     {"category": Activity.CATEGORIES, "status": Activity.STATUSES},
+    "wishlist_items": {"status": WishlistItem.STATUSES, "recipient_id": str},
+    "photos":         {"album_id": str},
+    "notes":          {"pinned": bool},
+}
+LIST_SORTS = {
+    "reminders":   ("created_at", "due_date"),
+    "restaurants": ("added_at", "name"),
+}
+
+def paged_list(col, query, field, direction=-1, expand=None):
+    """List response paged with `?limit=&after=`; the next cursor goes in X-Next-Cursor/Link.
+
+    `?all=1` keeps the legacy unpaginated behaviour (streamed, see LIST_STREAM).
+    `expand(docs)` may post-process the raw documents, one batch at a time when
+    streaming; they are encoded as-is by the JSON provider. Filters and sort from
+    LIST_FILTERS/LIST_SORTS are applied to `query` before paging.
+    """
+    try:
+        filters = parse_filters(request.args, LIST_FILTERS.get(col.name, {}))
+        field, direction = parse_sort(request.args.get("sort"), LIST_SORTS.get(col.name, (field,)), field, direction)
+    except FilterError as e:
+        return e.payload, 400
+    if filters: query = {**query, **filters}
+    projection = LIST_PROJECTIONS.get(col.name, LIST_PROJECTION)
+    if request.args.get("all", "").lower() in ("1","true","yes"):
+        cur = col.find(query, projection).sort([(field, direction), ("_id", direction)]).batch_size(LIST_STREAM_BATCH)
+        if LIST_STREAM:
+            chunks = app.json.stream_array(cur, LIST_STREAM_BATCH, expand)
+            return Response(stream_with_context(chunks), mimetype="application/json")
+        docs = list(cur)
+        nxt = None
+    else:
+        try: limit = int(request.args.get("limit", PAGE_SIZE_DEFAULT))
+        except ValueError: limit = PAGE_SIZE_DEFAULT
+        limit = max(1, min(limit, PAGE_SIZE_MAX))
+        try:
+            docs, nxt = fetch_page(col, query, field, direction, limit, request.args.get("after"), projection)
+        except ValueError:
+            return {"error": "invalid_cursor"}, 400
+    if expand: docs = expand(docs)
+    resp = jsonify(docs)
+    if nxt:
+        args = request.args.to_dict()
+        args["after"] = nxt
+        resp.headers["X-Next-Cursor"] = nxt
+        resp.headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return resp
+
+# ───────── Collection versions / conditional GET ─────────
+# One document per couple: {_id: couple_id, epoch, <collection name>: counter}.
+# Every write bumps the counter so list endpoints can answer If-None-Match cheaply,
+# and deletes leave a tombstone for /api/sync.
+events = CoupleBroker(history=int(os.getenv("STREAM_HISTORY", "200")))
+
+def stamp(fields):
+    fields["updated_at"] = dt.datetime.utcnow()
+    return fields
+
+def mark_changed(cid, col, action="update", doc_id=None):
+    mark_changed_many(cid, col, [(action, doc_id)])
+
+def mark_changed_many(cid, col, changes):
+    """Record a batch of `(action, doc_id)` writes with one version bump."""
+    versions_col.update_one(
+        {"_id": cid},
+        {"$inc": {col.name: len(changes)}, "$setOnInsert": {"epoch": uuid4().hex[:8]}},
+        upsert=True
+    )
+    now = dt.datetime.utcnow()
+    tombs = [{"couple_id": cid, "collection": col.name, "doc_id": doc_id, "deleted_at": now} for action, doc_id in changes if action == "delete" and doc_id]
+    if tombs:
+        tombstones_col.insert_many(tombs)
+    for action, doc_id in changes:
+        events.publish(str(cid), {"collection": col.name, "action": action, "id": str(doc_id) if doc_id else None})
+
+def collection_etag(cid, cols):
+    names = [c.name for c in cols]
+    v = versions_col.find_one({"_id": cid}, {n: 1 for n in names} | {"epoch": 1}) or {}
+    counters = ".".join(str(v.get(n, 0)) for n in names)
+    qs = hashlib.sha1(request.query_string).hexdigest()[:10]
+    return f'{"+".join(names)}-{v.get("epoch", "0")}-{counters}-{qs}'
+
+def conditional(*cols):
+    """Weak-ETag a couple-scoped list route; 304 without running the query when unchanged."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(u, cid, *args, **kwargs):
+            tag = collection_etag(cid, cols)
+            if request.if_none_match.contains_weak(tag):
+                resp = app.response_class(status=304)
+            else:
+                resp = make_response(fn(u, cid, *args, **kwargs))
+                if resp.status_code != 200:
+                    return resp
+                g.compress_key = f"{cid}:{tag}"
+            resp.set_etag(tag, weak=True)
+            resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+        return wrapper
+    return deco
+
 def new_invite_code(n=6):
     alphabet = string.ascii_uppercase + string.digits
     return ''.join(secrets.choice(alphabet) for _ in range(n))
@@ -96,35 +260,87 @@ def new_invite_code(n=6):
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), 'uploads')
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-def save_file(f):
-    ext = os.path.splitext(f.filename or '')[1][:8]
-    name = f"{uuid4().hex}{ext}"
-    path = os.path.join(UPLOAD_DIR, name)
-    f.save(path)
+# Uploads are content-addressed per couple (sha256 of couple id + content, <digest><ext>) so
+# re-uploading a file reuses it; thumb/preview variants are built in a process pool
+# (MEDIA_WORKERS=0 builds inline).
+media = MediaPipeline(UPLOAD_DIR, workers=int(os.getenv("MEDIA_WORKERS", "2")), quality=int(os.getenv("MEDIA_QUALITY", "80")))
+
+def save_file(f, scope):
+    """Store upload `f` under `scope` (couple id, or user id before joining a couple)."""
+    t0 = time.perf_counter()
+    name, _ = media.store(f, scope=str(scope).encode())
+    upload_refs_col.update_one({"_id": name}, {"$inc": {"refs": 1}}, upsert=True)
+    metrics.observe_upload(os.path.getsize(os.path.join(UPLOAD_DIR, name)), time.perf_counter() - t0)
+    media.variants(name)
     return f"/uploads/{name}"
 
-def ensure_indexes():
-    try:
-        users_col.create_index("email", unique=True)
-        users_col.create_index("couple_id")
-        couples_col.create_index("invite_code", unique=True)
-        for col in (reminders_col, restaurants_col, activities_col, wishlist_col, photos_col, notes_col, push_subs_col):
-            col.create_index("couple_id")
-            for fld in ("created_at","added_at","uploaded_at"):
-                try: col.create_index([(fld, -1)])
-                except: pass
-    except Exception as e:
-        print("WARN ensure_indexes:", e)
+def attach_variants(cid, pid, url):
+    """Record variant URLs on photo `pid` once built; returns them if already available."""
+    if not (url or '').startswith('/uploads/'): return None
+    fut = media.variants(url.split('/uploads/', 1)[1])
+    def done(fut):
+        try: names = fut.result()
+        except Exception as e:
+            print('variants err', e); return
+        if not names: return
+        photos_col.update_one({"_id": pid, "couple_id": cid}, {"$set": stamp({"variants": {k: f"/uploads/{v}" for k, v in names.items()}})})
+        mark_changed(cid, photos_col, "update", pid)
+    if fut.done():
+        done(fut)
+        names = fut.result()
+        return {k: f"/uploads/{v}" for k, v in names.items()} or None
+    fut.add_done_callback(done)
+    return None
+
+# upload_refs: {_id: filename, refs} counts the uploads and photos pointing at a shared file;
+# it is removed once the count drops to zero. Files from before the counter have no
+# entry and are kept.
+def add_upload_ref(url):
+    """Count one more reference to an already stored upload (a photo created from its URL)."""
+    if (url or '').startswith('/uploads/'):
+        upload_refs_col.update_one({"_id": url.split('/uploads/', 1)[1]}, {"$inc": {"refs": 1}})
+
+def release_upload(url, variants=None):
+    """Drop one reference to `url`; delete the file and its variants when none is left."""
+    if not (url or '').startswith('/uploads/'): return
+    name = url.split('/uploads/', 1)[1]
+    if not upload_refs_col.find_one_and_update({"_id": name}, {"$inc": {"refs": -1}}): return
+    if not upload_refs_col.delete_one({"_id": name, "refs": {"$lte": 0}}).deleted_count: return
+    for fname in [name] + [v.split('/uploads/', 1)[1] for v in (variants or {}).values()]:
+        fpath = os.path.join(UPLOAD_DIR, fname)
+        if os.path.isfile(fpath): os.remove(fpath)
+
+# Identity cache: user docs by JWT identity (email) and couple docs by _id.
+# Entries are shared between requests, so callers must treat them as read-only.
+# The cache is per process: invalidate_identity() only clears this worker, other
+# workers keep their copy until IDENTITY_CACHE_TTL runs out.
+IDENTITY_CACHE_TTL  = float(os.getenv("IDENTITY_CACHE_TTL", "30"))
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "2048"))
+user_cache   = TTLCache(maxsize=IDENTITY_CACHE_SIZE, ttl=IDENTITY_CACHE_TTL)
+couple_cache = TTLCache(maxsize=IDENTITY_CACHE_SIZE, ttl=IDENTITY_CACHE_TTL)
 
 def current_user():
     email = get_jwt_identity()
-    return users_col.find_one({"email": email})
+    return user_cache.get_or_load(email, lambda: users_col.find_one({"email": email}))
+
+def get_couple(cid):
+    if not cid: return None
+    return couple_cache.get_or_load(cid, lambda: couples_col.find_one({"_id": cid}))
+
+def invalidate_identity(email=None, cid=None):
+    if email: user_cache.pop(email)
+    if cid: couple_cache.pop(cid)
 
 def require_couple(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
         u = current_user()
         cid = u.get("couple_id") if u else None
+        if u and not cid:
+            # may have joined through another worker: check Mongo before refusing
+            invalidate_identity(email=u["email"])
+            u = current_user()
+            cid = u.get("couple_id") if u else None
         if not cid:
             return {"error": "not_in_couple"}, 409
         return fn(u, cid, *args, **kwargs)
@@ -146,11 +362,10 @@ def health_api():
     db_error = None
     try:
         # simple ping
-        client.admin.command('ping')
+        mongo.client.admin.command('ping')
     except Exception as e:
         db_ok = False
         db_error = str(e)
-    ensure_indexes()
     return {
         "status": "ok" if db_ok else "degraded",
         "scope": "api",
@@ -159,10 +374,35 @@ def health_api():
         "db_error": db_error,
         "origins": origins,
         "vapid_public_present": bool(VAPID_PUBLIC_KEY),
+        "push_queue": {**push_dispatcher.stats, "pending": push_dispatcher.pending()},
+        "identity_cache": {"users": user_cache.stats(), "couples": couple_cache.stats()},
+        "mongo_pool": mongo.pool_stats.snapshot(),
+        "compression": {**compressor.stats, "cache": compressor.cache.stats()},
+        "reminder_scheduler": {**reminder_scheduler.stats, "pending": reminder_scheduler.pending()},
         "preview_regex_enabled": any(hasattr(o, 'match') for o in origins),
     }
 
 # ───────── Auth ─────────
+# Hashing runs on a bounded pool; past PASSWORD_HASH_MAX_INFLIGHT concurrent hashes,
+# register/login answer 503 instead of starving the other routes. The cap is per
+# process and only matters under gevent (or the threaded dev server): a sync worker
+# runs one request at a time and is busy for the whole hash either way.
+passwords = PasswordHasher(
+    method=os.getenv("PASSWORD_HASH_METHOD", "scrypt"),
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+    max_inflight=int(os.getenv("PASSWORD_HASH_MAX_INFLIGHT", "8")),
+    wait=float(os.getenv("PASSWORD_HASH_WAIT", "2")),
+)
+
+@app.errorhandler(HasherBusy)
+def auth_busy(_e):
+    return {"error": "auth_busy"}, 503, {"Retry-After": "1"}
+
+def upgrade_password(user, new_hash):
+    # only if the password did not change in the meantime
+    res = users_col.update_one({"_id": user["_id"], "password": user["password"]}, {"$set": {"password": new_hash}})
+    if res.modified_count: invalidate_identity(email=user["email"])
+
 @app.post("/api/register")
 def register():
     data = request.get_json() or {}
@@ -173,7 +413,7 @@ def register():
         return {"error":"missing_fields"}, 400
     if users_col.find_one({"email": email}):
         return {"error":"email_exists"}, 400
-    hashed = generate_password_hash(pwd)
+    hashed = passwords.hash(pwd)
     user = {"name": name, "email": email, "password": hashed, "avatar_url": data.get("avatar_url",""), "joined_at": dt.datetime.utcnow(), "couple_id": None}
     res = users_col.insert_one(user)
     token = create_access_token(identity=email)
@@ -185,8 +425,10 @@ def login():
     email = (data.get("email") or "").lower().strip()
     pwd   = data.get("password") or ""
     user  = users_col.find_one({"email": email})
-    if not user or not check_password_hash(user["password"], pwd):
+    if not user or not passwords.verify(user.get("password"), pwd):
         return {"error":"invalid_credentials"}, 401
+    if passwords.needs_rehash(user["password"]):
+        passwords.rehash_later(pwd, lambda h: upgrade_password(user, h))
     token = create_access_token(identity=email)
     return {"access_token": token, "user": {"id": str(user["_id"]), "name": user["name"], "email": user["email"], "avatar_url": user.get("avatar_url","")}}
 
@@ -201,7 +443,7 @@ def get_users():
 def me_get():
     u = current_user()
     if not u: return {"error": "unauth"}, 401
-    return jsonify(serialize(u))
+    return jsonify(serialize({k: v for k, v in u.items() if k != "password"}))
 
 @app.put("/api/me")
 @jwt_required()
@@ -218,12 +460,15 @@ def me_update():
     if request.files and 'file' in request.files:
         f = request.files['file']
         if f:
-            url = save_file(f)
+            url = save_file(f, u.get("couple_id") or u["_id"])
             fields['avatar_url'] = url
 
     if fields:
         users_col.update_one({"_id": u["_id"]}, {"$set": fields})
-        u = users_col.find_one({"_id": u["_id"]})
+        invalidate_identity(email=u["email"])
+        u = users_col.find_one({"_id": u["_id"]}, {"password": 0})
+    else:
+        u = {k: v for k, v in u.items() if k != "password"}
         
     return jsonify(serialize(u))
 
@@ -239,6 +484,7 @@ def couple_create():
     couple = {"invite_code": code, "members": [u["_id"]], "name": None, "created_at": dt.datetime.utcnow()}
     res = couples_col.insert_one(couple)
     users_col.update_one({"_id": u["_id"]}, {"$set": {"couple_id": res.inserted_id}})
+    invalidate_identity(email=u["email"])
     return {"couple_id": str(res.inserted_id), "invite_code": code}
 
 @app.post("/api/couple/invite/refresh")
@@ -249,6 +495,7 @@ def couple_invite_refresh():
     if not cid: return {"error":"no_couple"}, 400
     code = new_invite_code()
     couples_col.update_one({"_id": cid}, {"$set": {"invite_code": code}})
+    invalidate_identity(cid=cid)
     return {"invite_code": code}
 
 @app.post("/api/couple/join")
@@ -265,6 +512,7 @@ def couple_join():
         return {"error":"couple_full"}, 400
     couples_col.update_one({"_id": c["_id"]}, {"$addToSet": {"members": u["_id"]}})
     users_col.update_one({"_id": u["_id"]}, {"$set": {"couple_id": c["_id"]}})
+    invalidate_identity(email=u["email"], cid=c["_id"])
     return {"ok": True, "couple_id": str(c["_id"])}
 
 @app.get("/api/couple/me")
@@ -274,25 +522,43 @@ def couple_me():
     cid = u.get("couple_id")
     if not cid:
         return {"in_couple": False}
-    c = couples_col.find_one({"_id": cid})
+    return couple_payload(get_couple(cid))
+
+def couple_payload(c):
+    if not c:
+        return {"in_couple": False}
     members = list(users_col.find({"_id": {"$in": c["members"]}}, {"password":0}))
-    return {"in_couple": True, "couple_id": str(cid), "invite_code": c.get("invite_code"), "members": [{"id": str(m["_id"]), "name": m["name"], "email": m["email"], "avatar_url": m.get("avatar_url","")} for m in members]}
+    return {"in_couple": True, "couple_id": str(c["_id"]), "invite_code": c.get("invite_code"), "members": [{"id": str(m["_id"]), "name": m["name"], "email": m["email"], "avatar_url": m.get("avatar_url","")} for m in members]}
 
 # ───────── Reminders ─────────
 @app.get("/api/reminders")
 @jwt_required()
 @require_couple
+@conditional(reminders_col)
 def reminders_list(u, cid):
-    items = list(reminders_col.find({"couple_id": cid}).sort("created_at",-1))
-    return jsonify([serialize(x) for x in items])
+    return paged_list(reminders_col, {"couple_id": cid}, "created_at")
+
+REMINDER_FIELDS = ["title","description","assigned_to","priority","due_date","status"]
+
+def new_reminder(data, u, cid):
+    return {"title": data["title"], "description": data.get("description",""), "created_by": str(u["_id"]), "assigned_to": data.get("assigned_to"), "priority": data.get("priority","normal"), "due_date": iso_to_dt(data.get("due_date")), "status": "pending", "created_at": dt.datetime.utcnow(), "couple_id": cid}
+
+def reminder_fields(data):
+    fields = {k: v for k,v in data.items() if k in REMINDER_FIELDS}
+    if "due_date" in fields:
+        fields["due_date"] = iso_to_dt(fields.get("due_date"))
+        fields["notified_at"] = None  # a new due date fires again
+    return fields
 
 @app.post("/api/reminders")
 @jwt_required()
 @require_couple
 def reminders_create(u, cid):
     data = request.get_json() or {}
-    item = {"title": data["title"], "description": data.get("description",""), "created_by": str(u["_id"]), "assigned_to": data.get("assigned_to"), "priority": data.get("priority","normal"), "due_date": iso_to_dt(data.get("due_date")), "status": "pending", "created_at": dt.datetime.utcnow(), "couple_id": cid}
-    res = reminders_col.insert_one(item); item["_id"]=str(res.inserted_id)
+    item = new_reminder(data, u, cid)
+    res = reminders_col.insert_one(stamp(item)); item["_id"]=str(res.inserted_id)
+    mark_changed(cid, reminders_col, "create", res.inserted_id)
+    if item.get("due_date"): reminder_scheduler.poke()
     try:
         payload = {'type': 'reminder_created','title': 'Nouveau rappel','body': f"{item['title']} (prio: {item['priority']})",'url': '/reminders'}
         broadcast_push(cid, u['email'], payload)
@@ -304,9 +570,10 @@ def reminders_create(u, cid):
 @jwt_required()
 @require_couple
 def reminders_update(u, cid, rid):
-    data = request.get_json() or {}
-    if "due_date" in data: data["due_date"] = iso_to_dt(data.get("due_date"))
-    reminders_col.update_one({"_id": oid(rid), "couple_id": cid}, {"$set": data})
+    fields = reminder_fields(request.get_json() or {})
+    reminders_col.update_one({"_id": oid(rid), "couple_id": cid}, {"$set": stamp(fields)})
+    mark_changed(cid, reminders_col, "update", oid(rid))
+    if fields.get("due_date"): reminder_scheduler.poke()
     return {"msg":"updated"}
 
 @app.delete("/api/reminders/<rid>")
@@ -314,15 +581,16 @@ def reminders_update(u, cid, rid):
 @require_couple
 def reminders_delete(u, cid, rid):
     reminders_col.delete_one({"_id": oid(rid), "couple_id": cid})
+    mark_changed(cid, reminders_col, "delete", oid(rid))
     return {"msg":"deleted"}
 
 # ───────── Restaurants ─────────
 @app.get("/api/restaurants")
 @jwt_required()
 @require_couple
+@conditional(restaurants_col)
 def restaurants_list(u, cid):
-    items = list(restaurants_col.find({"couple_id": cid}).sort("added_at",-1))
-    return jsonify([serialize(x) for x in items])
+    return paged_list(restaurants_col, {"couple_id": cid}, "added_at")
 
 @app.get('/api/restaurants/<rid>')
 @jwt_required()
@@ -332,22 +600,31 @@ def restaurants_get(u, cid, rid):
     if not doc: return {"error":"not_found"}, 404
     return jsonify(serialize(doc))
 
+RESTAURANT_FIELDS = ["name","address","map_url","image_url","status","notes","images"]
+
+def new_restaurant(data, u, cid):
+    return {"name": data["name"], "address": data.get("address",""), "map_url": data.get("map_url",""), "image_url": data.get("image_url",""), "images": data.get("images", []), "status": data.get("status","to_try"), "notes": data.get("notes",""), "added_by": str(u["_id"]), "added_at": dt.datetime.utcnow(), "couple_id": cid}
+
+def restaurant_fields(data):
+    return {k: v for k,v in data.items() if k in RESTAURANT_FIELDS}
+
 @app.post("/api/restaurants")
 @jwt_required()
 @require_couple
 def restaurants_create(u, cid):
     data = request.get_json() or {}
-    item = {"name": data["name"], "address": data.get("address",""), "map_url": data.get("map_url",""), "image_url": data.get("image_url",""), "images": data.get("images", []), "status": data.get("status","to_try"), "notes": data.get("notes",""), "added_by": str(u["_id"]), "added_at": dt.datetime.utcnow(), "couple_id": cid}
-    res = restaurants_col.insert_one(item); item["_id"]=str(res.inserted_id)
+    item = new_restaurant(data, u, cid)
+    res = restaurants_col.insert_one(stamp(item)); item["_id"]=str(res.inserted_id)
+    mark_changed(cid, restaurants_col, "create", res.inserted_id)
     return jsonify(serialize(item)), 201
 
 @app.put("/api/restaurants/<rid>")
 @jwt_required()
 @require_couple
 def restaurants_update(u, cid, rid):
-    data = request.get_json() or {}
-    fields = {k: v for k,v in data.items() if k in ["name","address","map_url","image_url","status","notes","images"]}
-    restaurants_col.update_one({"_id": oid(rid), "couple_id": cid}, {"$set": fields})
+    fields = restaurant_fields(request.get_json() or {})
+    restaurants_col.update_one({"_id": oid(rid), "couple_id": cid}, {"$set": stamp(fields)})
+    mark_changed(cid, restaurants_col, "update", oid(rid))
     return {"msg":"updated"}
 
 @app.delete("/api/restaurants/<rid>")
@@ -355,15 +632,16 @@ def restaurants_update(u, cid, rid):
 @require_couple
 def restaurants_delete(u, cid, rid):
     restaurants_col.delete_one({"_id": oid(rid), "couple_id": cid})
+    mark_changed(cid, restaurants_col, "delete", oid(rid))
     return {"msg":"deleted"}
 
 # ───────── Activities ─────────
 @app.get("/api/activities")
 @jwt_required()
 @require_couple
+@conditional(activities_col)
 def activities_list(u, cid):
-    items = list(activities_col.find({"couple_id": cid}).sort("added_at",-1))
-    return jsonify([serialize(x) for x in items])
+    return paged_list(activities_col, {"couple_id": cid}, "added_at")
 
 @app.get('/api/activities/<aid>')
 @jwt_required()
@@ -373,22 +651,31 @@ def activities_get(u, cid, aid):
     if not doc: return {"error":"not_found"}, 404
     return jsonify(serialize(doc))
 
+ACTIVITY_FIELDS = ["title","category","status","notes","image_url","images"]
+
+def new_activity(data, u, cid):
+    return {"title": data["title"], "category": data.get("category","other"), "status": data.get("status","planned"), "notes": data.get("notes",""), "images": data.get("images", []), "image_url": data.get("image_url",""), "added_by": str(u["_id"]), "added_at": dt.datetime.utcnow(), "couple_id": cid}
+
+def activity_fields(data):
+    return {k: v for k,v in data.items() if k in ACTIVITY_FIELDS}
+
 @app.post("/api/activities")
 @jwt_required()
 @require_couple
 def activities_create(u, cid):
     data = request.get_json() or {}
-    item = {"title": data["title"], "category": data.get("category","other"), "status": data.get("status","planned"), "notes": data.get("notes",""), "images": data.get("images", []), "image_url": data.get("image_url",""), "added_by": str(u["_id"]), "added_at": dt.datetime.utcnow(), "couple_id": cid}
-    res = activities_col.insert_one(item); item["_id"]=str(res.inserted_id)
+    item = new_activity(data, u, cid)
+    res = activities_col.insert_one(stamp(item)); item["_id"]=str(res.inserted_id)
+    mark_changed(cid, activities_col, "create", res.inserted_id)
     return jsonify(serialize(item)), 201
 
 @app.put("/api/activities/<aid>")
 @jwt_required()
 @require_couple
 def activities_update(u, cid, aid):
-    data = request.get_json() or {}
-    fields = {k: v for k,v in data.items() if k in ["title","category","status","notes","image_url","images"]}
-    activities_col.update_one({"_id": oid(aid), "couple_id": cid}, {"$set": fields})
+    fields = activity_fields(request.get_json() or {})
+    activities_col.update_one({"_id": oid(aid), "couple_id": cid}, {"$set": stamp(fields)})
+    mark_changed(cid, activities_col, "update", oid(aid))
     return {"msg":"updated"}
 
 @app.delete("/api/activities/<aid>")
@@ -396,56 +683,79 @@ def activities_update(u, cid, aid):
 @require_couple
 def activities_delete(u, cid, aid):
     activities_col.delete_one({"_id": oid(aid), "couple_id": cid})
+    mark_changed(cid, activities_col, "delete", oid(aid))
     return {"msg":"deleted"}
 
 # ───────── Wishlist ─────────
 @app.get("/api/wishlist")
 @jwt_required()
 @require_couple
+@conditional(wishlist_col, photos_col)
 def wishlist_list(u, cid):
     # Include legacy items that may lack couple_id but were added by members
     member_ids = []
     try:
-        c = couples_col.find_one({"_id": cid}, {"members":1})
+        c = get_couple(cid)
         if c:
             member_ids = c.get("members", [])
     except Exception:
         pass
-    query = {"$or": [
+    return paged_list(wishlist_col, wishlist_query(cid, member_ids), "added_at", expand=expand_wishlist_images)
+
+def wishlist_query(cid, member_ids):
+    return {"$or": [
         {"couple_id": cid},
         {"couple_id": {"$exists": False}, "added_by": {"$in": [str(m) for m in member_ids]}}
     ]}
-    items = list(wishlist_col.find(query).sort("added_at", -1))
+
+def resolve_photos(ids):
+    """Map photo id string -> photo doc in one `$in` query, memoized on `g` for the request."""
+    memo = g.setdefault("photo_refs", {})
+    missing = {i for i in ids if i not in memo}
+    oids = [o for o in (oid(i) for i in missing) if o]
+    if oids:
+        for ph in photos_col.find({"_id": {"$in": oids}}, {"url": 1}):
+            memo[str(ph["_id"])] = ph
+    for i in missing:
+        memo.setdefault(i, None)
+    return memo
+
+def expand_wishlist_images(items):
     # Expand image id references if they look like photo objectids and photos exist
-    enriched = []
+    refs = {str(img) for it in items for img in (it.get("images") or []) if not isinstance(img, dict)}
+    photos = resolve_photos(refs) if refs else {}
     for it in items:
-        images = it.get("images") or []
         expanded_images = []
-        for img in images:
-            if isinstance(img, dict):
-                expanded_images.append(img)
-                continue
-            # treat as id referencing photos collection
-            try:
-                ph = photos_col.find_one({"_id": oid(img)})
-                if ph:
-                    expanded_images.append({"_id": str(ph["_id"]), "url": ph.get("url"), "filename": os.path.basename(ph.get("url",""))})
-                else:
-                    expanded_images.append(img)
-            except Exception:
+        for img in it.get("images") or []:
+            ph = None if isinstance(img, dict) else photos.get(str(img))
+            if ph:
+                expanded_images.append({"_id": str(ph["_id"]), "url": ph.get("url"), "filename": os.path.basename(ph.get("url") or "")})
+            else:
                 expanded_images.append(img)
         it["images"] = expanded_images
-        enriched.append(serialize(it))
-    return jsonify(enriched)
+    return items
+
+WISHLIST_FIELDS = ["title","description","image_url","link_url","for_user","recipient_id","status","images"]
+
+def new_wishlist_item(data, u, cid):
+    recipient_id = data.get("recipient_id") or data.get("for_user")
+    return {"title": data["title"], "description": data.get("description",""), "image_url": data.get("image_url",""), "images": data.get("images", []), "link_url": data.get("link_url",""), "for_user": recipient_id, "recipient_id": recipient_id, "added_by": str(u["_id"]), "status": data.get("status","idea"), "added_at": dt.datetime.utcnow(), "couple_id": cid}
+
+def wishlist_fields(data):
+    fields = {k: v for k,v in data.items() if k in WISHLIST_FIELDS}
+    # Accept recipient_id alias
+    if 'recipient_id' in fields and 'for_user' not in fields:
+        fields['for_user'] = fields['recipient_id']
+    return fields
 
 @app.post("/api/wishlist")
 @jwt_required()
 @require_couple
 def wishlist_create(u, cid):
     data = request.get_json() or {}
-    recipient_id = data.get("recipient_id") or data.get("for_user")
-    item = {"title": data["title"], "description": data.get("description",""), "image_url": data.get("image_url",""), "images": data.get("images", []), "link_url": data.get("link_url",""), "for_user": recipient_id, "recipient_id": recipient_id, "added_by": str(u["_id"]), "status": data.get("status","idea"), "added_at": dt.datetime.utcnow(), "couple_id": cid}
-    res = wishlist_col.insert_one(item); item["_id"]=str(res.inserted_id)
+    item = new_wishlist_item(data, u, cid)
+    res = wishlist_col.insert_one(stamp(item)); item["_id"]=str(res.inserted_id)
+    mark_changed(cid, wishlist_col, "create", res.inserted_id)
     try:
         payload = {'type': 'wishlist_created','title': 'Wishlist','body': f"Nouvel item: {item['title']}",'url': '/wishlist'}
         broadcast_push(cid, u['email'], payload)
@@ -457,12 +767,9 @@ def wishlist_create(u, cid):
 @jwt_required()
 @require_couple
 def wishlist_update(u, cid, wid):
-    data = request.get_json() or {}
-    # Accept recipient_id alias
-    if 'recipient_id' in data and 'for_user' not in data:
-        data['for_user'] = data['recipient_id']
-    fields = {k: v for k,v in data.items() if k in ["title","description","image_url","link_url","for_user","recipient_id","status","images"]}
-    wishlist_col.update_one({"_id": oid(wid), "couple_id": cid}, {"$set": fields})
+    fields = wishlist_fields(request.get_json() or {})
+    wishlist_col.update_one({"_id": oid(wid), "couple_id": cid}, {"$set": stamp(fields)})
+    mark_changed(cid, wishlist_col, "update", oid(wid))
     return {"msg":"updated"}
 
 # ───────── Couples (list) ─────────
@@ -475,7 +782,7 @@ def couples_list():
     cid = u.get('couple_id')
     if not cid:
         return jsonify([])
-    c = couples_col.find_one({'_id': cid})
+    c = get_couple(cid)
     if not c:
         return jsonify([])
     # Provide a simple representation with name or members names joined
@@ -488,15 +795,16 @@ def couples_list():
 @require_couple
 def wishlist_delete(u, cid, wid):
     wishlist_col.delete_one({"_id": oid(wid), "couple_id": cid})
+    mark_changed(cid, wishlist_col, "delete", oid(wid))
     return {"msg":"deleted"}
 
 # ───────── Photos ─────────
 @app.get("/api/photos")
 @jwt_required()
 @require_couple
+@conditional(photos_col)
 def photos_list(u, cid):
-    items = list(photos_col.find({"couple_id": cid}).sort("uploaded_at",-1))
-    return jsonify([serialize(x) for x in items])
+    return paged_list(photos_col, {"couple_id": cid}, "uploaded_at")
 
 @app.post("/api/photos")
 @jwt_required()
@@ -509,9 +817,12 @@ def photos_create(u, cid):
         created = []
         for f in files:
             try:
-                url = save_file(f)
+                url = save_file(f, cid)
                 item = {"url": url, "caption": caption, "album_id": album_id, "uploaded_by": str(u["_id"]), "uploaded_at": dt.datetime.utcnow(), "couple_id": cid}
-                res = photos_col.insert_one(item); item["_id"]=str(res.inserted_id)
+                res = photos_col.insert_one(stamp(item)); item["_id"]=str(res.inserted_id)
+                mark_changed(cid, photos_col, "create", res.inserted_id)
+                variants = attach_variants(cid, res.inserted_id, url)
+                if variants: item["variants"] = variants
                 created.append(serialize(item))
             except Exception as e:
                 print('upload error', e)
@@ -519,16 +830,25 @@ def photos_create(u, cid):
     data = request.get_json() or {}
     if not data.get('url'): return {"error":"missing_url"}, 400
     item = {"url": data["url"], "caption": data.get("caption",""), "album_id": data.get("album_id"), "uploaded_by": str(u["_id"]), "uploaded_at": dt.datetime.utcnow(), "couple_id": cid}
-    res = photos_col.insert_one(item); item["_id"]=str(res.inserted_id)
+    res = photos_col.insert_one(stamp(item)); item["_id"]=str(res.inserted_id)
+    mark_changed(cid, photos_col, "create", res.inserted_id)
+    add_upload_ref(item["url"])
+    variants = attach_variants(cid, res.inserted_id, item["url"])
+    if variants: item["variants"] = variants
     return jsonify(serialize(item)), 201
 
+PHOTO_FIELDS = ["caption","album_id"]
+
+def photo_fields(data):
+    return {k: v for k,v in data.items() if k in PHOTO_FIELDS}
+
 @app.put("/api/photos/<pid>")
 @jwt_required()
 @require_couple
 def photos_update(u, cid, pid):
-    data = request.get_json() or {}
-    fields = {k: v for k,v in data.items() if k in ["caption","album_id"]}
-    photos_col.update_one({"_id": oid(pid), "couple_id": cid}, {"$set": fields})
+    fields = photo_fields(request.get_json() or {})
+    photos_col.update_one({"_id": oid(pid), "couple_id": cid}, {"$set": stamp(fields)})
+    mark_changed(cid, photos_col, "update", oid(pid))
     return {"msg":"updated"}
 
 @app.delete("/api/photos/<pid>")
@@ -538,12 +858,9 @@ def photos_delete(u, cid, pid):
     doc = photos_col.find_one({"_id": oid(pid), "couple_id": cid})
     if not doc: return {"error": "not_found"}, 404
     photos_col.delete_one({"_id": oid(pid), "couple_id": cid})
+    mark_changed(cid, photos_col, "delete", oid(pid))
     try:
-        url = doc.get('url') or ''
-        if url.startswith('/uploads/'):
-            fname = url.split('/uploads/',1)[1]
-            fpath = os.path.join(UPLOAD_DIR, fname)
-            if os.path.isfile(fpath): os.remove(fpath)
+        release_upload(doc.get('url'), doc.get('variants'))
     except Exception as e:
         print('file delete err', e)
     return {"msg":"deleted"}
@@ -552,26 +869,35 @@ def photos_delete(u, cid, pid):
 @app.get("/api/notes")
 @jwt_required()
 @require_couple
+@conditional(notes_col)
 def notes_list(u, cid):
-    items = list(notes_col.find({"couple_id": cid}).sort("created_at",-1))
-    return jsonify([serialize(x) for x in items])
+    return paged_list(notes_col, {"couple_id": cid}, "created_at")
+
+NOTE_FIELDS = ["content","pinned"]
+
+def new_note(data, u, cid):
+    return {"content": data["content"], "pinned": bool(data.get("pinned", False)), "created_by": str(u["_id"]), "created_at": dt.datetime.utcnow(), "couple_id": cid}
+
+def note_fields(data):
+    return {k: v for k,v in data.items() if k in NOTE_FIELDS}
 
 @app.post("/api/notes")
 @jwt_required()
 @require_couple
 def notes_create(u, cid):
     data = request.get_json() or {}
-    item = {"content": data["content"], "pinned": bool(data.get("pinned", False)), "created_by": str(u["_id"]), "created_at": dt.datetime.utcnow(), "couple_id": cid}
-    res = notes_col.insert_one(item); item["_id"]=str(res.inserted_id)
+    item = new_note(data, u, cid)
+    res = notes_col.insert_one(stamp(item)); item["_id"]=str(res.inserted_id)
+    mark_changed(cid, notes_col, "create", res.inserted_id)
     return jsonify(serialize(item)), 201
 
 @app.put("/api/notes/<nid>")
 @jwt_required()
 @require_couple
 def notes_update(u, cid, nid):
-    data = request.get_json() or {}
-    fields = {k: v for k,v in data.items() if k in ["content","pinned"]}
-    notes_col.update_one({"_id": oid(nid), "couple_id": cid}, {"$set": fields})
+    fields = note_fields(request.get_json() or {})
+    notes_col.update_one({"_id": oid(nid), "couple_id": cid}, {"$set": stamp(fields)})
+    mark_changed(cid, notes_col, "update", oid(nid))
     return {"msg":"updated"}
 
 @app.delete("/api/notes/<nid>")
@@ -579,6 +905,7 @@ def notes_update(u, cid, nid):
 @require_couple
 def notes_delete(u, cid, nid):
     notes_col.delete_one({"_id": oid(nid), "couple_id": cid})
+    mark_changed(cid, notes_col, "delete", oid(nid))
     return {"msg":"deleted"}
 
 # ───────── Upload generic ─────────
@@ -591,15 +918,36 @@ def upload_files(u, cid):
     urls = []
     for f in request.files.getlist('files'):
         try:
-            url = save_file(f)
+            url = save_file(f, cid)
             urls.append(url)
         except Exception as e:
             print('upload err', e)
     return {'files': urls}
 
+# Upload names never change content (sha256 or random uuid), so they are cached forever.
+# UPLOADS_ACCEL_REDIRECT=/internal-prefix/ hands the transfer to nginx; UPLOADS_X_SENDFILE=1
+# emits X-Sendfile for Apache/lighttpd. Otherwise werkzeug serves ranges and lets the
+# WSGI server's file_wrapper use sendfile().
+UPLOAD_MAX_AGE         = int(os.getenv("UPLOAD_MAX_AGE", str(365 * 24 * 3600)))
+UPLOADS_ACCEL_REDIRECT = os.getenv("UPLOADS_ACCEL_REDIRECT", "")
+app.config["USE_X_SENDFILE"] = os.getenv("UPLOADS_X_SENDFILE", "0") in ("1","true","True")
+
 @app.get('/uploads/<path:fname>')
 def serve_upload(fname):
-    return send_from_directory(UPLOAD_DIR, fname)
+    path = safe_join(UPLOAD_DIR, fname)
+    if not path or not os.path.isfile(path):
+        return {"error": "not_found"}, 404
+    etag = os.path.splitext(os.path.basename(fname))[0]
+    if UPLOADS_ACCEL_REDIRECT:
+        resp = app.response_class(mimetype=mimetypes.guess_type(fname)[0] or "application/octet-stream")
+        resp.headers["X-Accel-Redirect"] = UPLOADS_ACCEL_REDIRECT.rstrip("/") + "/" + fname
+        resp.set_etag(etag)
+    else:
+        resp = send_from_directory(UPLOAD_DIR, fname, max_age=UPLOAD_MAX_AGE, etag=etag, conditional=True)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = UPLOAD_MAX_AGE
+    resp.cache_control.immutable = True
+    return resp
 
 # ───────── Web Push ─────────
 try:
@@ -613,25 +961,41 @@ VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY", "")
 VAPID_SUBJECT     = os.getenv("VAPID_SUBJECT", "mailto:admin@example.com")
 DEBUG_PUSH        = os.getenv("DEBUG_PUSH", "0") in ("1","true","True")
 
+PUSH_TIMEOUT      = float(os.getenv("PUSH_TIMEOUT", "5"))
+PUSH_WORKERS      = int(os.getenv("PUSH_WORKERS", "4"))
+PUSH_QUEUE_SIZE   = int(os.getenv("PUSH_QUEUE_SIZE", "1000"))
+PUSH_RETRIES      = int(os.getenv("PUSH_RETRIES", "3"))
+
 def send_push(subscription, payload: dict):
+    t0 = time.perf_counter()
+    ok, err = _send_push(subscription, payload)
+    metrics.observe_push(time.perf_counter() - t0, err)
+    return ok, err
+
+def _send_push(subscription, payload):
     if not (webpush and VAPID_PUBLIC_KEY and VAPID_PRIVATE_KEY):
         return False, 'missing_webpush_or_keys'
     try:
-        data_str = jsonify(payload).get_data(as_text=True)
+        # Plain json.dumps: this also runs on dispatcher threads without an app context
+        data_str = json.dumps(payload, ensure_ascii=False)
         if DEBUG_PUSH:
             print('[PUSH][SEND]', subscription.get('endpoint','')[:55], payload.get('title'))
         webpush(
             subscription_info=subscription,
             data=data_str,
             vapid_private_key=VAPID_PRIVATE_KEY,
-            vapid_public_key=VAPID_PUBLIC_KEY,
-            vapid_claims={"sub": VAPID_SUBJECT}
+            vapid_claims={"sub": VAPID_SUBJECT},
+            timeout=PUSH_TIMEOUT
         )
         return True, None
     except WebPushException as ex:
         if DEBUG_PUSH:
             print('[PUSH][ERROR]', ex)
         return False, str(ex)
+    except Exception as ex:  # timeouts / connection errors from requests
+        if DEBUG_PUSH:
+            print('[PUSH][ERROR]', ex)
+        return False, f"{type(ex).__name__}: {ex}"
 
 @app.get('/api/push/public-key')
 def push_public_key():
@@ -666,25 +1030,53 @@ def push_test():
         return {"error":"send_failed","detail": err}, 500
     return {"sent": True}
 
+push_dispatcher = PushDispatcher(
+    load_subs=lambda couple_id: list(push_subs_col.find({"couple_id": couple_id})),
+    send=send_push,
+    prune=lambda s: push_subs_col.delete_one({'_id': s['_id']}),
+    workers=PUSH_WORKERS, maxsize=PUSH_QUEUE_SIZE, retries=PUSH_RETRIES,
+    log=lambda *a: DEBUG_PUSH and print(*a),
+)
+
 def broadcast_push(couple_id, author_email, payload: dict, exclude_author=True):
+    """Queue a push to the couple's subscriptions; delivery happens off-request."""
     if not (webpush and VAPID_PUBLIC_KEY and VAPID_PRIVATE_KEY):
-        return
-    query = {"couple_id": couple_id}
-    subs = list(push_subs_col.find(query))
-    for s in subs:
-        if exclude_author and s.get('user_email') == author_email:
-            continue
-        ok, err = send_push(s.get('subscription', {}), payload)
-        if not ok and err and ('410' in err or 'expired' in err.lower()):
-            push_subs_col.delete_one({'_id': s['_id']})
+        return False
+    return push_dispatcher.submit(couple_id, author_email, payload, exclude_author)
+
+# ───────── Due-date reminders ─────────
+# Each worker runs a scheduler thread (started by create_app); a lease on the reminder
+# makes sure only one of them sends it. Reminders more than REMINDER_GRACE seconds
+# overdue when first seen (e.g. after downtime) are not sent.
+REMINDER_SCHEDULER = os.getenv("REMINDER_SCHEDULER", "true").lower() in ("1","true","yes")
+
+def notify_due_reminders(couple_id, reminders):
+    """One push per couple for every reminder coming due in the same tick."""
+    titles = [r.get("title") or "Rappel" for r in reminders]
+    if len(titles) == 1:
+        title, body = "⏰ Rappel", titles[0]
+    else:
+        title, body = f"⏰ {len(titles)} rappels", ", ".join(titles[:5]) + ("…" if len(titles) > 5 else "")
+    payload = {'type': 'reminder_due', 'title': title, 'body': body, 'url': '/reminders'}
+    return broadcast_push(couple_id, None, payload, exclude_author=False)
+
+reminder_scheduler = ReminderScheduler(
+    reminders_col, notify_due_reminders,
+    changed=lambda cid, ids: mark_changed_many(cid, reminders_col, [("update", _id) for _id in ids]),
+    interval=int(os.getenv("REMINDER_SCAN_INTERVAL", "60")),
+    lookahead=int(os.getenv("REMINDER_LOOKAHEAD", "600")),
+    grace=int(os.getenv("REMINDER_GRACE", "3600")),
+    lease=int(os.getenv("REMINDER_LEASE", "120")),
+    log=lambda *a: print(*a),
+)
 
 # ───────── Albums ─────────
 @app.get("/api/albums")
 @jwt_required()
 @require_couple
+@conditional(albums_col)
 def albums_list(u, cid):
-    items = list(albums_col.find({"couple_id": cid}).sort("created_at", -1))
-    return jsonify([serialize(x) for x in items])
+    return paged_list(albums_col, {"couple_id": cid}, "created_at")
 
 @app.post("/api/albums")
 @jwt_required()
@@ -700,7 +1092,8 @@ def albums_create(u, cid):
         "created_at": dt.datetime.utcnow(),
         "couple_id": cid
     }
-    res = albums_col.insert_one(item)
+    res = albums_col.insert_one(stamp(item))
+    mark_changed(cid, albums_col, "create", res.inserted_id)
     item["_id"] = str(res.inserted_id)
     return jsonify(serialize(item)), 201
 
@@ -709,26 +1102,23 @@ def albums_create(u, cid):
 @require_couple
 def albums_delete(u, cid, aid):
     albums_col.delete_one({"_id": oid(aid), "couple_id": cid})
+    mark_changed(cid, albums_col, "delete", oid(aid))
     # Detach photos from this album
-    photos_col.update_many({"album_id": aid, "couple_id": cid}, {"$set": {"album_id": None}})
+    photos_col.update_many({"album_id": aid, "couple_id": cid}, {"$set": stamp({"album_id": None})})
+    mark_changed(cid, photos_col, "update")
     return {"msg": "deleted"}
 
 # ───────── Memories ─────────
 @app.get("/api/memories")
 @jwt_required()
 @require_couple
+@conditional(memories_col)
 def memories_list(u, cid):
-    items = list(memories_col.find({"couple_id": cid}).sort("date", -1))
-    return jsonify([serialize(x) for x in items])
+    return paged_list(memories_col, {"couple_id": cid}, "date")
 
-@app.post("/api/memories")
-@jwt_required()
-@require_couple
-def memories_create(u, cid):
-    data = request.get_json() or {}
-    if not data.get("title"): return {"error": "missing_title"}, 400
-    
-    item = {
+def new_memory(data, u, cid):
+    if not data.get("title"): raise KeyError("title")
+    return {
         "title": data["title"],
         "content": data.get("content", ""),
         "date": iso_to_dt(data.get("date")) or dt.datetime.utcnow(),
@@ -737,23 +1127,36 @@ def memories_create(u, cid):
         "created_at": dt.datetime.utcnow(),
         "couple_id": cid
     }
-    res = memories_col.insert_one(item)
-    item["_id"] = str(res.inserted_id)
-    return jsonify(serialize(item)), 201
 
-@app.put("/api/memories/<mid>")
-@jwt_required()
-@require_couple
-def memories_update(u, cid, mid):
-    data = request.get_json() or {}
+def memory_fields(data):
     fields = {}
     if "title" in data: fields["title"] = data["title"]
     if "content" in data: fields["content"] = data["content"]
     if "date" in data: fields["date"] = iso_to_dt(data["date"])
     if "photo_url" in data: fields["photo_url"] = data["photo_url"]
+    return fields
+
+@app.post("/api/memories")
+@jwt_required()
+@require_couple
+def memories_create(u, cid):
+    data = request.get_json() or {}
+    if not data.get("title"): return {"error": "missing_title"}, 400
     
+    item = new_memory(data, u, cid)
+    res = memories_col.insert_one(stamp(item))
+    mark_changed(cid, memories_col, "create", res.inserted_id)
+    item["_id"] = str(res.inserted_id)
+    return jsonify(serialize(item)), 201
+
+@app.put("/api/memories/<mid>")
+@jwt_required()
+@require_couple
+def memories_update(u, cid, mid):
+    fields = memory_fields(request.get_json() or {})
     if fields:
-        memories_col.update_one({"_id": oid(mid), "couple_id": cid}, {"$set": fields})
+        memories_col.update_one({"_id": oid(mid), "couple_id": cid}, {"$set": stamp(fields)})
+        mark_changed(cid, memories_col, "update", oid(mid))
     return {"msg": "updated"}
 
 @app.delete("/api/memories/<mid>")
@@ -761,6 +1164,7 @@ def memories_update(u, cid, mid):
 @require_couple
 def memories_delete(u, cid, mid):
     memories_col.delete_one({"_id": oid(mid), "couple_id": cid})
+    mark_changed(cid, memories_col, "delete", oid(mid))
     return {"msg": "deleted"}
 
 # ───────── Comments ─────────
@@ -790,7 +1194,8 @@ def comments_create(u, cid):
         "created_at": dt.datetime.utcnow(),
         "couple_id": cid
     }
-    res = comments_col.insert_one(item)
+    res = comments_col.insert_one(stamp(item))
+    mark_changed(cid, comments_col, "create", res.inserted_id)
     item["_id"] = str(res.inserted_id)
     return jsonify(serialize(item)), 201
 
@@ -799,6 +1204,7 @@ def comments_create(u, cid):
 @require_couple
 def comments_delete(u, cid, comment_id):
     comments_col.delete_one({"_id": oid(comment_id), "couple_id": cid})
+    mark_changed(cid, comments_col, "delete", oid(comment_id))
     return {"msg": "deleted"}
 
 # ───────── Reactions ─────────
@@ -809,7 +1215,7 @@ def reactions_list(u, cid):
     tt = request.args.get("target_type")
     tid = request.args.get("target_id")
     if not (tt and tid): return jsonify([])
-    items = list(reactions_col.find({"couple_id": cid, "target_type": tt, "target_id": tid}))
+    items = list(reactions_col.find({"couple_id": cid, "target_type": tt, "target_id": tid, "active": {"$ne": False}}))
     return jsonify([serialize(x) for x in items])
 
 @app.post("/api/reactions")
@@ -820,23 +1226,224 @@ def reactions_toggle(u, cid):
     if not (data.get("target_type") and data.get("target_id") and data.get("emoji")):
         return {"error": "missing_fields"}, 400
     
+    emoji = str(data["emoji"])
+    if len(emoji) > 32 or "." in emoji or emoji.startswith("$"):
+        return {"error": "invalid_emoji"}, 400
     query = {
         "couple_id": cid,
         "target_type": data["target_type"],
         "target_id": data["target_id"],
-        "emoji": data["emoji"],
+        "emoji": emoji,
         "created_by": str(u["_id"])
     }
-    
-    existing = reactions_col.find_one(query)
-    if existing:
-        reactions_col.delete_one({"_id": existing["_id"]})
-        return {"action": "removed"}
-    else:
-        item = query.copy()
-        item["created_at"] = dt.datetime.utcnow()
-        reactions_col.insert_one(item)
-        return {"action": "added"}
+    # One atomic upsert on the unique (couple, target, emoji, user) key flips `active`:
+    # a fresh document (no created_at yet) starts active; legacy documents without
+    # the flag count as active and are switched off.
+    now = dt.datetime.utcnow()
+    toggle = [{"$set": {
+        "active": {"$cond": [{"$eq": [{"$type": "$created_at"}, "missing"]}, True, {"$eq": ["$active", False]}]},
+        "created_at": {"$ifNull": ["$created_at", now]},
+        "updated_at": now,
+    }}]
+    try:
+        doc = reactions_col.find_one_and_update(query, toggle, projection={"active": 1}, upsert=True, return_document=ReturnDocument.AFTER)
+    except DuplicateKeyError:
+        # concurrent first tap inserted it: toggle the existing document instead
+        doc = reactions_col.find_one_and_update(query, toggle, projection={"active": 1}, return_document=ReturnDocument.AFTER)
+    delta = 1 if doc["active"] else -1
+    counts = reaction_counts_col.find_one_and_update(
+        {"couple_id": cid, "target_type": query["target_type"], "target_id": query["target_id"]},
+        {"$inc": {f"counts.{emoji}": delta}},
+        projection={"counts": 1}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    mark_changed(cid, reactions_col, "update", doc["_id"])
+    return {"action": "added" if doc["active"] else "removed", "count": max(0, counts["counts"].get(emoji, 0))}
+
+# ───────── Bulk writes ─────────
+# POST /api/<collection>/bulk {"ordered": true, "ops": [{"op": "create", "data": {...}},
+# {"op": "update", "id": "...", "data": {...}}, {"op": "delete", "id": "..."}]}
+# Ops go through the same builders / field whitelists as the single routes and are
+# sent as one bulk_write, always scoped to the caller's couple.
+BULK_MAX_OPS = int(os.getenv("BULK_MAX_OPS", "500"))
+
+# name -> (collection, create builder or None, update field filter, deletes allowed)
+def bulk_push(u, cid, col, applied, payload):
+    """One push for every document an applied bulk created; `payload(docs)` builds it."""
+    created = [_id for action, _id in applied if action == "create"]
+    if not created: return
+    try:
+        docs = list(col.find({"_id": {"$in": created}}, {"title": 1, "priority": 1}))
+        if docs: broadcast_push(cid, u['email'], payload(docs))
+    except Exception as e:
+        if DEBUG_PUSH: print('[PUSH][BULK][ERROR]', e)
+
+def titles_line(docs):
+    titles = [d.get('title') or '' for d in docs]
+    return ", ".join(titles[:5]) + ("…" if len(titles) > 5 else "")
+
+def notify_bulk_reminders(u, cid, applied):
+    """Same side effects as the single reminder routes: rescan due dates, push the creates."""
+    reminder_scheduler.poke()
+    bulk_push(u, cid, reminders_col, applied, lambda docs: {
+        'type': 'reminder_created', 'url': '/reminders',
+        **({'title': 'Nouveau rappel', 'body': f"{docs[0]['title']} (prio: {docs[0]['priority']})"} if len(docs) == 1
+           else {'title': f'{len(docs)} nouveaux rappels', 'body': titles_line(docs)})})
+
+def notify_bulk_wishlist(u, cid, applied):
+    bulk_push(u, cid, wishlist_col, applied, lambda docs: {
+        'type': 'wishlist_created', 'title': 'Wishlist', 'url': '/wishlist',
+        'body': f"Nouvel item: {docs[0]['title']}" if len(docs) == 1 else f"{len(docs)} nouveaux items: {titles_line(docs)}"})
+
+# name -> (collection, build, fields, deletes allowed, notify(u, cid, applied) or None);
+# notify repeats what the single-document routes do besides writing (pushes, scheduler)
+BULK_SPECS = {
+    "reminders":   (reminders_col,   new_reminder,      reminder_fields,   True,  notify_bulk_reminders),
+    "restaurants": (restaurants_col, new_restaurant,    restaurant_fields, True,  None),
+    "activities":  (activities_col,  new_activity,      activity_fields,   True,  None),
+    "wishlist":    (wishlist_col,    new_wishlist_item, wishlist_fields,   True,  notify_bulk_wishlist),
+    "notes":       (notes_col,       new_note,          note_fields,       True,  None),
+    "memories":    (memories_col,    new_memory,        memory_fields,     True,  None),
+    "photos":      (photos_col,      None,              photo_fields,      False, None),  # deletes also clean up files
+}
+
+def bulk_request(spec, op, u, cid):
+    """Translate one client op into (pymongo request, (action, id)) or raise ValueError(code)."""
+    col, build, fields_of, can_delete, _ = spec
+    kind = op.get("op") if isinstance(op, dict) else None
+    data = (op.get("data") or {}) if kind else None
+    if kind in ("create", "update") and not isinstance(data, dict):
+        raise ValueError("invalid_data")
+    if kind == "create" and build:
+        try: doc = build(data, u, cid)
+        except (KeyError, TypeError): raise ValueError("missing_fields")
+        doc["_id"] = ObjectId()
+        return InsertOne(stamp(doc)), ("create", doc["_id"])
+    if kind in ("update", "delete"):
+        _id = oid(op.get("id"))
+        if not _id: raise ValueError("invalid_id")
+        if kind == "delete" and can_delete:
+            return DeleteOne({"_id": _id, "couple_id": cid}), ("delete", _id)
+        if kind == "update":
+            fields = fields_of(data)
+            if not fields: raise ValueError("no_fields")
+            return UpdateOne({"_id": _id, "couple_id": cid}, {"$set": stamp(fields)}), ("update", _id)
+    raise ValueError("unsupported_op")
+
+@app.post(f"/api/<any({','.join(BULK_SPECS)}):name>/bulk")
+@jwt_required()
+@require_couple
+def bulk_write(u, cid, name):
+    spec = BULK_SPECS[name]
+    data = request.get_json() or {}
+    ops = data.get("ops")
+    if not isinstance(ops, list) or not ops:
+        return {"error": "missing_ops"}, 400
+    if len(ops) > BULK_MAX_OPS:
+        return {"error": "too_many_ops", "max": BULK_MAX_OPS}, 400
+    ordered = data.get("ordered", True)
+    if not isinstance(ordered, bool):
+        return {"error": "invalid_ordered"}, 400
+
+    results = [{"op": op.get("op") if isinstance(op, dict) else None, "ok": False, "error": "skipped"} for op in ops]
+    # ids this couple actually has, so updates/deletes of unknown ids are not reported applied
+    targets = [oid(op.get("id")) for op in ops if isinstance(op, dict) and op.get("op") in ("update", "delete")]
+    existing = {d["_id"] for d in spec[0].find({"_id": {"$in": [t for t in targets if t]}, "couple_id": cid}, {"_id": 1})} if targets else set()
+    reqs, positions, changes = [], [], []
+    for i, op in enumerate(ops):
+        try:
+            req, change = bulk_request(spec, op, u, cid)
+            action, _id = change
+            if action != "create" and _id not in existing:
+                raise ValueError("not_found")
+            if action == "delete":
+                existing.discard(_id)
+        except ValueError as e:
+            results[i]["error"] = str(e)
+            if ordered: break
+            continue
+        reqs.append(req); positions.append(i); changes.append(change)
+
+    failed = {}
+    summary = {"inserted": 0, "matched": 0, "modified": 0, "deleted": 0}
+    if reqs:
+        col = spec[0]
+        try:
+            res = col.bulk_write(reqs, ordered=ordered)
+            details = res.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            failed = {we["index"]: we.get("errmsg", "write_error") for we in details.get("writeErrors", [])}
+        summary = {"inserted": details.get("nInserted", 0), "matched": details.get("nMatched", 0),
+                   "modified": details.get("nModified", 0), "deleted": details.get("nRemoved", 0)}
+        # an ordered bulk stops at its first failure; later requests never ran
+        stop = min(failed) if (ordered and failed) else len(reqs)
+        applied = []
+        for j, i in enumerate(positions):
+            if j in failed:
+                results[i]["error"] = failed[j]
+            elif j < stop:
+                action, _id = changes[j]
+                results[i] = {"op": action, "ok": True, "id": str(_id)}
+                applied.append(changes[j])
+        if applied:
+            mark_changed_many(cid, col, applied)
+            notify = spec[4]
+            if notify: notify(u, cid, applied)
+    return jsonify({"ordered": ordered, **summary, "results": results})
+
+# ───────── Comment / reaction summaries ─────────
+SUMMARY_MAX_TARGETS = int(os.getenv("SUMMARY_MAX_TARGETS", "200"))
+
+@app.post("/api/social/summary")
+@jwt_required()
+@require_couple
+def social_summary(u, cid):
+    """Comment count, latest comment and per-emoji reactions for many targets at once.
+
+    Body: {"targets": [{"target_type": "restaurant", "target_id": "..."}, ...]}
+    """
+    data = request.get_json() or {}
+    targets = []
+    for t in data.get("targets") or []:
+        if isinstance(t, dict) and t.get("target_type") and t.get("target_id"):
+            pair = (str(t["target_type"]), str(t["target_id"]))
+            if pair not in targets: targets.append(pair)
+    if not targets: return jsonify([])
+    if len(targets) > SUMMARY_MAX_TARGETS:
+        return {"error": "too_many_targets", "max": SUMMARY_MAX_TARGETS}, 400
+    match = {"$match": {"couple_id": cid, "$or": [{"target_type": tt, "target_id": tid} for tt, tid in targets]}}
+    pipeline = [
+        match,
+        {"$sort": {"created_at": -1}},
+        {"$group": {
+            "_id": {"t": "$target_type", "i": "$target_id"},
+            "count": {"$sum": 1},
+            "latest": {"$first": {"_id": "$_id", "content": "$content", "created_by": "$created_by", "created_at": "$created_at"}},
+        }},
+        {"$set": {"kind": "comments"}},
+        # reaction totals come from the denormalized counters, never from a reactions scan
+        {"$unionWith": {"coll": reaction_counts_col.name, "pipeline": [
+            match,
+            {"$project": {"_id": {"t": "$target_type", "i": "$target_id"}, "counts": 1, "kind": "counts"}},
+        ]}},
+        {"$unionWith": {"coll": reactions_col.name, "pipeline": [
+            {"$match": {**match["$match"], "created_by": str(u["_id"]), "active": {"$ne": False}}},
+            {"$project": {"_id": {"t": "$target_type", "i": "$target_id", "e": "$emoji"}, "kind": "mine"}},
+        ]}},
+    ]
+    out = {pair: {"target_type": pair[0], "target_id": pair[1], "comment_count": 0, "latest_comment": None, "reactions": {}} for pair in targets}
+    for row in comments_col.aggregate(pipeline):
+        entry = out.get((row["_id"]["t"], row["_id"]["i"]))
+        if entry is None: continue
+        if row["kind"] == "comments":
+            entry["comment_count"] = row["count"]
+            entry["latest_comment"] = row["latest"]
+        elif row["kind"] == "counts":
+            for emoji, n in (row.get("counts") or {}).items():
+                if n > 0: entry["reactions"].setdefault(emoji, {"reacted": False})["count"] = n
+        else:
+            entry["reactions"].setdefault(row["_id"]["e"], {"count": 1})["reacted"] = True
+    return jsonify(list(out.values()))
 
 # ───────── Settings ─────────
 @app.get("/api/settings")
@@ -845,15 +1452,18 @@ def settings_get():
     u = current_user()
     if not u: return {"error": "unauth"}, 401
     
+    return jsonify(settings_payload(u))
+
+def settings_payload(u):
     s = settings_col.find_one({"user_id": str(u["_id"])})
     if not s:
         # Return defaults
-        return jsonify({
+        return {
             "theme": "dark",
             "notifications_enabled": True,
             "language": "fr"
-        })
-    return jsonify(serialize(s))
+        }
+    return serialize(s)
 
 @app.put("/api/settings")
 @jwt_required()
@@ -875,6 +1485,243 @@ def settings_update():
         )
     return {"msg": "updated"}
 
+# ───────── Bootstrap ─────────
+# Everything the dashboard needs after login in one request; the per-collection
+# queries run concurrently and each list is capped (follow `next` with the list route).
+BOOTSTRAP_LIMIT = int(os.getenv("BOOTSTRAP_LIMIT", "20"))
+bootstrap_pool  = ThreadPoolExecutor(max_workers=int(os.getenv("BOOTSTRAP_WORKERS", "8")), thread_name_prefix="bootstrap")
+
+BOOTSTRAP_LISTS = (
+    ("reminders",   reminders_col,   "created_at"),
+    ("notes",       notes_col,       "created_at"),
+    ("restaurants", restaurants_col, "added_at"),
+    ("activities",  activities_col,  "added_at"),
+    ("wishlist",    wishlist_col,    "added_at"),
+    ("photos",      photos_col,      "uploaded_at"),
+    ("albums",      albums_col,      "created_at"),
+    ("memories",    memories_col,    "date"),
+)
+
+@app.get("/api/bootstrap")
+@jwt_required()
+def bootstrap():
+    u = current_user()
+    if not u: return {"error": "unauth"}, 401
+    try: limit = max(1, min(int(request.args.get("limit", BOOTSTRAP_LIMIT)), PAGE_SIZE_MAX))
+    except ValueError: limit = BOOTSTRAP_LIMIT
+    cid = u.get("couple_id")
+    c = get_couple(cid)
+    jobs = {
+        "couple":   bootstrap_pool.submit(couple_payload, c),
+        "settings": bootstrap_pool.submit(settings_payload, u),
+    }
+    if c:
+        for key, col, field in BOOTSTRAP_LISTS:
+            query = wishlist_query(cid, c.get("members", [])) if col is wishlist_col else {"couple_id": cid}
+            jobs[key] = bootstrap_pool.submit(fetch_page, col, query, field, -1, limit, None, LIST_PROJECTIONS.get(col.name, LIST_PROJECTION))
+    out = {"me": serialize({k: v for k, v in u.items() if k != "password"}), "limit": limit}
+    for key, fut in jobs.items():
+        res = fut.result()
+        if isinstance(res, tuple):
+            docs, nxt = res
+            if key == "wishlist": docs = expand_wishlist_images(docs)
+            res = {"items": docs, "next": nxt}
+        out[key] = res
+    return jsonify(out)
+
+# ───────── Search ─────────
+# GET /api/search?q=&types=&limit=&offset=: one French text index per collection
+# (migration 6, prefixed by couple_id, diacritic-insensitive). Each collection is
+# queried concurrently for its best offset+limit hits, then merged by text score.
+SEARCH_LIMIT_DEFAULT = int(os.getenv("SEARCH_LIMIT_DEFAULT", "20"))
+SEARCH_LIMIT_MAX     = int(os.getenv("SEARCH_LIMIT_MAX", "50"))
+SEARCH_MAX_OFFSET    = int(os.getenv("SEARCH_MAX_OFFSET", "200"))
+SEARCH_SNIPPET       = int(os.getenv("SEARCH_SNIPPET", "160"))
+
+# type -> (collection, title field, text fields, date field)
+SEARCH_SOURCES = {
+    "notes":       (notes_col,       None,    ("content",),                  "created_at"),
+    "memories":    (memories_col,    "title", ("title", "content"),          "date"),
+    "reminders":   (reminders_col,   "title", ("title", "description"),      "created_at"),
+    "restaurants": (restaurants_col, "name",  ("name", "address", "notes"),  "added_at"),
+    "activities":  (activities_col,  "title", ("title", "notes"),            "added_at"),
+    "wishlist":    (wishlist_col,    "title", ("title", "description"),      "added_at"),
+}
+
+def search_source(col, cid, q, fields, date_field, n):
+    proj = {"score": {"$meta": "textScore"}, date_field: 1, **{f: 1 for f in fields}}
+    query = {"couple_id": cid, "$text": {"$search": q, "$language": "french"}}
+    return list(col.find(query, proj).sort([("score", {"$meta": "textScore"})]).limit(n))
+
+def search_hit(kind, doc, terms):
+    _, title, fields, date_field = SEARCH_SOURCES[kind]
+    body = [f for f in fields if f != title and doc.get(f)]
+    text = next((doc[f] for f in body if has_term(doc[f], terms)), doc[body[0]] if body else doc.get(title, ""))
+    return {
+        "type": kind, "_id": doc["_id"], "title": doc.get(title) if title else None,
+        "snippet": snippet(str(text), terms, SEARCH_SNIPPET),
+        "score": round(doc.get("score", 0.0), 4), "date": doc.get(date_field),
+    }
+
+@app.get("/api/search")
+@jwt_required()
+@require_couple
+def search(u, cid):
+    q = " ".join((request.args.get("q") or "").split())[:200]
+    if len(q) < 2: return {"error": "missing_query"}, 400
+    types = [t for t in request.args.get("types", "").split(",") if t] or list(SEARCH_SOURCES)
+    if any(t not in SEARCH_SOURCES for t in types): return {"error": "invalid_types"}, 400
+    try:
+        limit = max(1, min(int(request.args.get("limit", SEARCH_LIMIT_DEFAULT)), SEARCH_LIMIT_MAX))
+        offset = max(0, int(request.args.get("offset", 0)))
+    except ValueError:
+        return {"error": "invalid_paging"}, 400
+    if offset > SEARCH_MAX_OFFSET: return {"error": "offset_too_large"}, 400
+    # the bootstrap pool already bounds per-request fan-out
+    jobs = {t: bootstrap_pool.submit(search_source, SEARCH_SOURCES[t][0], cid, q, SEARCH_SOURCES[t][2], SEARCH_SOURCES[t][3], offset + limit + 1)
+            for t in types}
+    hits = [(t, d) for t, fut in jobs.items() for d in fut.result()]
+    hits.sort(key=lambda h: h[1].get("score", 0.0), reverse=True)
+    terms = query_terms(q)
+    items = [search_hit(t, d, terms) for t, d in hits[offset:offset + limit]]
+    nxt = offset + limit if len(hits) > offset + limit else None
+    return jsonify({"query": q, "items": items, "next": nxt})
+
+# ───────── Delta sync ─────────
+# GET /api/sync?since=<token>: documents written after the token plus tombstones of
+# deleted ids. Without a token (or one older than the tombstone TTL) the response is
+# a full snapshot with "full": true and the client should replace its local state.
+# Each collection returns at most SYNC_LIMIT documents in (updated_at, _id) order;
+# when one is cut, "more" is true and the client fetches GET /api/sync?page=<next>
+# until it is false, then keeps "token" (the same on every page) for the next sync.
+SYNC_TOMBSTONE_TTL = int(os.getenv("SYNC_TOMBSTONE_TTL", str(30 * 24 * 3600)))
+SYNC_SKEW = dt.timedelta(seconds=int(os.getenv("SYNC_SKEW_SECONDS", "5")))
+SYNC_LIMIT = int(os.getenv("SYNC_LIMIT", "500"))
+SYNC_COLLECTIONS = {
+    "reminders": reminders_col, "restaurants": restaurants_col, "activities": activities_col,
+    "wishlist": wishlist_col, "photos": photos_col, "albums": albums_col, "memories": memories_col,
+    "notes": notes_col, "comments": comments_col, "reactions": reactions_col,
+}
+
+def sync_token(when):
+    return str(int(when.replace(tzinfo=dt.timezone.utc).timestamp() * 1000))
+
+def parse_sync_token(token):
+    try: return dt.datetime.utcfromtimestamp(int(token) / 1000)
+    except (TypeError, ValueError, OverflowError, OSError): return None
+
+def sync_page(since, now, cursors):
+    """Continuation token: `<since>.<now>.<key>:<cursor>,...` (since is empty for a full sync)."""
+    return f"{sync_token(since) if since else ''}.{sync_token(now)}." + ",".join(f"{k}:{c}" for k, c in cursors.items())
+
+def parse_sync_page(page):
+    """`(since, now, {key: cursor})`; raises ValueError on a malformed token."""
+    try:
+        since, now, rest = page.split(".", 2)
+        cursors = dict(part.split(":", 1) for part in rest.split(","))
+    except (AttributeError, ValueError) as e:
+        raise ValueError("invalid_token") from e
+    since = parse_sync_token(since) if since else None
+    now = parse_sync_token(now)
+    if now is None or (since is None and page[0] != ".") or not set(cursors) <= set(SYNC_COLLECTIONS):
+        raise ValueError("invalid_token")
+    return since, now, cursors
+
+@app.get("/api/sync")
+@jwt_required()
+@require_couple
+def sync(u, cid):
+    if request.args.get("page"):
+        try: since, now, cursors = parse_sync_page(request.args["page"])
+        except ValueError: return {"error": "invalid_token"}, 400
+    else:
+        now, cursors = dt.datetime.utcnow(), None
+        since = parse_sync_token(request.args.get("since"))
+        if request.args.get("since") and not since:
+            return {"error": "invalid_token"}, 400
+    full = since is None or now - since > dt.timedelta(seconds=SYNC_TOMBSTONE_TTL)
+    c = get_couple(cid) or {}
+    changes, deleted, more = {}, {}, {}
+    for key, col in SYNC_COLLECTIONS.items():
+        if cursors is not None and key not in cursors:
+            continue  # finished on an earlier page
+        query = wishlist_query(cid, c.get("members", [])) if col is wishlist_col else {"couple_id": cid}
+        if not full:
+            query = {"$and": [query, {"updated_at": {"$gt": since - SYNC_SKEW}}]}
+        try:
+            changes[key], nxt = fetch_page(col, query, "updated_at", 1, SYNC_LIMIT, (cursors or {}).get(key), LIST_PROJECTIONS.get(col.name, LIST_PROJECTION))
+        except ValueError:
+            return {"error": "invalid_token"}, 400
+        if nxt: more[key] = nxt
+    if not full and cursors is None:
+        for t in tombstones_col.find({"couple_id": cid, "deleted_at": {"$gt": since - SYNC_SKEW}}, {"collection": 1, "doc_id": 1}):
+            key = next((k for k, col in SYNC_COLLECTIONS.items() if col.name == t["collection"]), None)
+            if key: deleted.setdefault(key, []).append(str(t["doc_id"]))
+    return jsonify({"token": sync_token(now), "full": full, "changes": changes, "deleted": deleted,
+                    "more": bool(more), "next": sync_page(None if full else since, now, more) if more else None})
+
+# ───────── Live updates (SSE) ─────────
+# GET /api/stream: one `change` event per write in the couple. EventSource cannot set
+# headers, so the JWT may also be passed as ?jwt=. Each open stream holds a worker, so
+# it answers 503 unless the worker is async (GUNICORN_WORKER_CLASS=gevent) or
+# STREAM_ALLOW_SYNC is set (threaded dev server). Events only reach streams in the
+# process that handled the write: run a single worker (see gunicorn.conf.py).
+STREAM_HEARTBEAT    = float(os.getenv("STREAM_HEARTBEAT", "15"))
+STREAM_MAX_DURATION = float(os.getenv("STREAM_MAX_DURATION", "600"))
+STREAM_ALLOW_SYNC   = os.getenv("STREAM_ALLOW_SYNC", "false").lower() in ("1","true","yes")
+
+def async_worker():
+    try:
+        from gevent import monkey  # type: ignore
+    except Exception:
+        return False
+    return monkey.is_module_patched("socket")
+
+def sse(event):
+    return f"id: {event['id']}\nevent: change\ndata: {json.dumps(event['data'])}\n\n"
+
+@app.get("/api/stream")
+@jwt_required(locations=["headers", "query_string"])
+@require_couple
+def stream(u, cid):
+    if not (STREAM_ALLOW_SYNC or async_worker()):
+        return {"error": "stream_unavailable"}, 503, {"Retry-After": "60"}
+    key = str(cid)
+    sub = events.subscribe(key)
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    backlog = events.replay(key, last_id) if last_id else []
+
+    def generate():
+        try:
+            yield f"retry: 3000\n: connected {events.boot}\n\n"
+            if backlog is None:
+                # history lost (restart, other worker, overflow): client should refetch
+                yield "event: reset\ndata: {}\n\n"
+            for e in backlog or ():
+                yield sse(e)
+            deadline = time.monotonic() + STREAM_MAX_DURATION
+            while time.monotonic() < deadline:
+                e = sub.get(timeout=STREAM_HEARTBEAT)
+                yield sse(e) if e else ": ping\n\n"
+        finally:
+            sub.close()
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+    })
+
 # ───────── Entrypoint ─────────
+def create_app():
+    """WSGI factory for gunicorn (`app:create_app()`), called in each worker after the fork.
+
+    Opens the Mongo client here rather than at import so no connection or monitor
+    thread is ever shared between processes.
+    """
+    mongo.connect()
+    if REMINDER_SCHEDULER and webpush and VAPID_PUBLIC_KEY and VAPID_PRIVATE_KEY:
+        reminder_scheduler.start()
+    return app
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)), debug=False)
+    STREAM_ALLOW_SYNC = True  # the dev server is threaded
+    create_app().run(host="0.0.0.0", port=int(os.getenv("PORT", 5000)), debug=False)
@@ -0,0 +1,248 @@
+"""End-to-end API benchmark: seeded database, real Flask app, per-endpoint latency.
+
+    python bench/bench_api.py [--backend mongod|memory] [--couples 20] [--docs 200]
+                              [--requests 200] [--only list_reminders,auth_login]
+                              [--out bench/results] [--compare bench/results/<old>.json]
+
+`--backend mongod` (default) seeds MONGODB_URI (default mongodb://127.0.0.1:27017/)
+in database BENCH_DB (default us_app_bench), dropped first and migrated with
+migrations.py so the real indexes exist. `--backend memory` uses mongomock
+(`pip install mongomock`) as an in-memory stand-in: handy for smoke runs, but
+its timings say nothing about Mongo itself.
+
+Requests go through the Flask test client, so numbers cover routing, auth, Mongo
+and encoding but not the HTTP server (bench_concurrency.py measures that). Every
+run is written to `<out>/<utc time>-<commit>.json`; `--compare` prints the p50/p95
+change against an earlier file. `--seed` makes data and request order repeatable.
+"""
+
+import argparse, io, json, os, platform, random, subprocess, sys, time, datetime as dt
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+PASSWORD = "bench-password"
+
+
+def load_app(args):
+    """Import app.py against the benchmark database (env must be set before the import)."""
+    os.environ["MONGODB_URI"] = args.mongo_uri
+    os.environ["MONGODB_DB"] = args.db
+    os.environ.setdefault("JWT_SECRET_KEY", "bench-secret-key-long-enough-for-hs256")
+    if args.backend == "memory":
+        import mongomock, pymongo  # type: ignore
+        pymongo.MongoClient = mongomock.MongoClient
+    import app as A
+    return A
+
+
+def percentile(values, p):
+    if not values: return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+# ───────── Seeding ─────────
+def seed(A, args, rng):
+    """Drop and fill the benchmark database; returns [(user, couple_id)] for two members per couple."""
+    from models.models import Reminder
+    A.mongo.client.drop_database(args.db)
+    if args.backend == "mongod":
+        import migrations
+        migrations.migrate(A.mongo.db)
+    hashed = A.passwords.hash(PASSWORD)
+    now = dt.datetime.utcnow()
+    members = []
+    for i in range(args.couples):
+        cid = A.couples_col.insert_one({"invite_code": f"B{i:05d}", "members": [], "name": f"Couple {i}", "created_at": now}).inserted_id
+        pair = []
+        for j in range(2):
+            u = {"name": f"User {i}-{j}", "email": f"bench{i}-{j}@example.com", "password": hashed,
+                 "avatar_url": "", "joined_at": now, "couple_id": cid}
+            u["_id"] = A.users_col.insert_one(u).inserted_id
+            pair.append(u)
+        A.couples_col.update_one({"_id": cid}, {"$set": {"members": [u["_id"] for u in pair]}})
+        members += [(u, cid) for u in pair]
+
+        def docs(build, field):
+            out = []
+            for k in range(args.docs):
+                d = A.stamp(build(rng.choice(pair), k))
+                d[field] = now - dt.timedelta(minutes=k)
+                out.append(d)
+            return out
+
+        A.reminders_col.insert_many(docs(lambda u, k: A.new_reminder(
+            {"title": f"Rappel {k}", "description": "Penser à réserver " * 3, "priority": rng.choice(Reminder.PRIORITIES)}, u, cid), "created_at"))
+        A.restaurants_col.insert_many(docs(lambda u, k: A.new_restaurant(
+            {"name": f"Restaurant {k}", "address": f"{k} rue de la Paix, Paris", "notes": "Terrasse"}, u, cid), "added_at"))
+        A.activities_col.insert_many(docs(lambda u, k: A.new_activity({"title": f"Activité {k}"}, u, cid), "added_at"))
+        A.wishlist_col.insert_many(docs(lambda u, k: A.new_wishlist_item({"title": f"Idée {k}"}, u, cid), "added_at"))
+        A.notes_col.insert_many(docs(lambda u, k: A.new_note({"content": f"Note {k} " * 10}, u, cid), "created_at"))
+        A.memories_col.insert_many(docs(lambda u, k: A.new_memory({"title": f"Souvenir {k}", "content": "Une belle journée"}, u, cid), "date"))
+        A.photos_col.insert_many(docs(lambda u, k: {
+            "url": f"/uploads/{k:064x}.jpg", "caption": f"Photo {k}", "album_id": None,
+            "uploaded_by": str(u["_id"]), "uploaded_at": now, "couple_id": cid}, "uploaded_at"))
+    return members
+
+
+def make_image(rng):
+    """A small JPEG with random pixels (so every upload is a new file), or raw bytes without Pillow."""
+    try:
+        from PIL import Image  # type: ignore
+    except Exception:
+        return rng.randbytes(256 * 1024), "bench.bin"
+    im = Image.new("RGB", (800, 600), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    im.putdata([(rng.randrange(256),) * 3 for _ in range(800 * 60)] + [(0, 0, 0)] * (800 * 540))
+    buf = io.BytesIO()
+    im.save(buf, "JPEG", quality=85)
+    return buf.getvalue(), "bench.jpg"
+
+
+# ───────── Scenarios ─────────
+def scenarios(rng, tokens, members):
+    """name -> callable(client) issuing one request and returning its response."""
+    def auth():
+        return {"Authorization": f"Bearer {rng.choice(tokens)}"}
+
+    def login(c):
+        u, _ = rng.choice(members)
+        return c.post("/api/login", json={"email": u["email"], "password": PASSWORD})
+
+    def lister(path):
+        return lambda c: c.get(path, headers=auth())
+
+    def creator(path, body):
+        return lambda c: c.post(path, json=body(), headers=auth())
+
+    def upload(c):
+        data, name = make_image(rng)
+        return c.post("/api/photos", data={"files": (io.BytesIO(data), name)}, headers=auth(), content_type="multipart/form-data")
+
+    return {
+        "auth_login":       login,
+        "list_reminders":   lister("/api/reminders"),
+        "list_restaurants": lister("/api/restaurants"),
+        "list_photos":      lister("/api/photos"),
+        "list_notes":       lister("/api/notes"),
+        "create_reminder":  creator("/api/reminders", lambda: {"title": f"Bench {rng.random():.6f}", "priority": "normal"}),
+        "create_note":      creator("/api/notes", lambda: {"content": f"Bench note {rng.random():.6f}"}),
+        "upload_photo":     upload,
+    }
+
+
+def run(fn, client, n):
+    lat, errors = [], 0
+    fn(client)  # warm-up
+    t0 = time.perf_counter()
+    for _ in range(n):
+        s = time.perf_counter()
+        resp = fn(client)
+        d = time.perf_counter() - s
+        if resp.status_code >= 400:
+            errors += 1
+        else:
+            lat.append(d)
+    wall = time.perf_counter() - t0
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "requests": n,
+        "errors": errors,
+        "rps": round(n / wall, 1),
+        "mean_ms": ms(sum(lat) / len(lat)) if lat else None,
+        "p50_ms": ms(percentile(lat, 50)),
+        "p95_ms": ms(percentile(lat, 95)),
+        "p99_ms": ms(percentile(lat, 99)),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current, path):
+    with open(path) as fh:
+        old = json.load(fh)
+    print(f"\nvs {os.path.basename(path)} ({old['meta']['commit']}):")
+    for name, r in current["results"].items():
+        o = old["results"].get(name)
+        if not o or not o.get("p50_ms") or not r.get("p50_ms"):
+            continue
+        d50 = (r["p50_ms"] / o["p50_ms"] - 1) * 100
+        d95 = (r["p95_ms"] / o["p95_ms"] - 1) * 100
+        print(f"  {name:<18} p50 {o['p50_ms']:>9.2f} → {r['p50_ms']:>9.2f} ms ({d50:+.1f}%)   p95 {d95:+.1f}%")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backend", choices=["mongod", "memory"], default="mongod")
+    ap.add_argument("--mongo-uri", default=os.getenv("BENCH_MONGODB_URI", "mongodb://127.0.0.1:27017/"))
+    ap.add_argument("--db", default=os.getenv("BENCH_DB", "us_app_bench"))
+    ap.add_argument("--couples", type=int, default=20)
+    ap.add_argument("--docs", type=int, default=200, help="documents per collection per couple")
+    ap.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    ap.add_argument("--only", default="", help="comma-separated scenario names")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", default=os.path.join(ROOT, "bench", "results"))
+    ap.add_argument("--compare")
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    A = load_app(args)
+    t0 = time.perf_counter()
+    members = seed(A, args, rng)
+    seed_s = time.perf_counter() - t0
+    with A.app.app_context():
+        tokens = [A.create_access_token(identity=u["email"]) for u, _ in members]
+
+    uploads_before = set(os.listdir(A.UPLOAD_DIR))
+    client = A.app.test_client()
+    cases = scenarios(rng, tokens, members)
+    only = [s for s in args.only.split(",") if s]
+    results = {}
+    try:
+        for name, fn in cases.items():
+            if only and name not in only:
+                continue
+            results[name] = run(fn, client, args.requests)
+            print(f"{name:<18} {results[name]['rps']:>8.1f} req/s   p50 {results[name]['p50_ms']} ms   "
+                  f"p95 {results[name]['p95_ms']} ms   p99 {results[name]['p99_ms']} ms   errors {results[name]['errors']}")
+    finally:
+        # benchmark uploads are not kept: wait for their variants, then remove every new file
+        for name in set(os.listdir(A.UPLOAD_DIR)) - uploads_before:
+            if ".part" not in name and name.count(".") == 1:
+                try: A.media.variants(name).result(timeout=60)
+                except Exception: pass
+        for name in set(os.listdir(A.UPLOAD_DIR)) - uploads_before:
+            try: os.remove(os.path.join(A.UPLOAD_DIR, name))
+            except OSError: pass
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "time": dt.datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "couples": args.couples,
+            "docs_per_collection": args.docs,
+            "requests_per_scenario": args.requests,
+            "seed": args.seed,
+            "seed_seconds": round(seed_s, 2),
+        },
+        "results": results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{dt.datetime.utcnow():%Y%m%dT%H%M%SZ}-{report['meta']['commit']}.json")
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nresults → {os.path.relpath(path, ROOT)}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Concurrency benchmark: the same app under sync vs gevent gunicorn workers.
+
+    python bench/bench_concurrency.py [--workers 2] [--concurrency 50] [--requests 1000]
+                                      [--path /api/health] [--token JWT] [--modes sync,gevent]
+
+Each mode boots `gunicorn -c gunicorn.conf.py app:create_app()` on a local port with the
+same worker count, then `--concurrency` client threads hammer `--path`. The
+default path pings Mongo, so MONGODB_URI must point at a reachable server; the
+gain grows with the round-trip time (an Atlas cluster shows it far better than a
+local mongod). Pass `--token` to benchmark an authenticated list route.
+"""
+
+import argparse, json, os, signal, socket, subprocess, sys, time, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {proc.returncode}")
+        try:
+            urllib.request.urlopen(url + "/health", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start")
+
+
+def percentile(values, p):
+    if not values: return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def load(url, headers, concurrency, total):
+    def one(_):
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=60) as r:
+                r.read()
+                ok = r.status < 500
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - t0
+    lat = [d for ok, d in results if ok]
+    return {
+        "requests": total,
+        "errors": total - len(lat),
+        "seconds": round(wall, 3),
+        "rps": round(total / wall, 1),
+        "p50_ms": round(percentile(lat, 50) * 1000, 1) if lat else None,
+        "p95_ms": round(percentile(lat, 95) * 1000, 1) if lat else None,
+        "p99_ms": round(percentile(lat, 99) * 1000, 1) if lat else None,
+    }
+
+
+def run_mode(mode, args):
+    port = free_port()
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=mode, WEB_CONCURRENCY=str(args.workers), PORT=str(port))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}", "app:create_app()"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base, proc)
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+        load(base + args.path, headers, args.concurrency, min(args.requests, args.concurrency))  # warm-up
+        return load(base + args.path, headers, args.concurrency, args.requests)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try: proc.wait(timeout=30)
+        except subprocess.TimeoutExpired: proc.kill()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--requests", type=int, default=1000)
+    ap.add_argument("--path", default="/api/health")
+    ap.add_argument("--token", default=os.getenv("BENCH_TOKEN"))
+    ap.add_argument("--modes", default="sync,gevent")
+    args = ap.parse_args()
+
+    results = {mode: run_mode(mode, args) for mode in args.modes.split(",")}
+    if "sync" in results and results["sync"]["rps"]:
+        for r in results.values():
+            r["speedup"] = round(r["rps"] / results["sync"]["rps"], 2)
+    print(json.dumps({"path": args.path, "workers": args.workers, "concurrency": args.concurrency, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
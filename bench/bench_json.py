@@ -0,0 +1,74 @@
+"""Micro-benchmark: legacy serialize()+jsonify vs the FastJSONProvider path.
+
+    python bench/bench_json.py [--docs 1000] [--rounds 200]
+
+No database needed: documents are generated in memory with the same shape as
+the reminders list (ObjectIds, datetimes, strings).
+"""
+
+import argparse, json, os, sys, timeit, datetime as dt
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bson.objectid import ObjectId
+from flask import Flask, jsonify
+from services.json_provider import FastJSONProvider
+
+
+def serialize(doc):
+    # copy of the legacy helper from app.py
+    if not doc: return None
+    d = dict(doc)
+    if "_id" in d: d["_id"] = str(d["_id"])
+    if "couple_id" in d and isinstance(d["couple_id"], ObjectId):
+        d["couple_id"] = str(d["couple_id"])
+    return d
+
+
+def make_docs(n):
+    cid, uid = ObjectId(), str(ObjectId())
+    now = dt.datetime.utcnow()
+    return [{
+        "_id": ObjectId(), "title": f"Rappel {i}", "description": "Penser à réserver le restaurant " * 3,
+        "created_by": uid, "assigned_to": uid, "priority": "normal", "status": "pending",
+        "due_date": now + dt.timedelta(days=i), "created_at": now - dt.timedelta(minutes=i), "couple_id": cid,
+    } for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=1000)
+    ap.add_argument("--rounds", type=int, default=200)
+    args = ap.parse_args()
+    docs = make_docs(args.docs)
+
+    legacy = Flask("legacy")
+    fast = Flask("fast"); fast.json = FastJSONProvider(fast, engine="orjson")
+    stdlib = Flask("stdlib"); stdlib.json = FastJSONProvider(stdlib, engine="json")
+
+    def run_legacy():
+        with legacy.app_context():
+            return jsonify([serialize(x) for x in docs]).get_data()
+
+    def run_provider(a):
+        def run():
+            with a.app_context():
+                return jsonify(docs).get_data()
+        return run
+
+    cases = {"legacy": run_legacy, "fast_stdlib": run_provider(stdlib)}
+    if fast.json.use_orjson:
+        cases["fast_orjson"] = run_provider(fast)
+    results = {}
+    for name, fn in cases.items():
+        fn()
+        best = min(timeit.repeat(fn, number=args.rounds, repeat=3)) / args.rounds
+        results[name] = {"ms_per_response": round(best * 1000, 3), "bytes": len(fn())}
+    base = results["legacy"]["ms_per_response"]
+    for r in results.values():
+        r["speedup"] = round(base / r["ms_per_response"], 2)
+    print(json.dumps({"docs": args.docs, "rounds": args.rounds, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -66,7 +66,7 @@ export default function Activities() {
   useEffect(() => { load(); }, []);
 
   const load = async () => {
-    try { const r = await authService.api.get('/api/activities'); setItems(r.data); }
+    try { const r = await authService.listAll('/api/activities'); setItems(r.data); }
     catch (e) { console.error(e); }
   };
 
@@ -180,7 +180,7 @@ export default function Memories() {
 
   const load = async () => {
     try {
-      const res = await authService.api.get('/api/memories');
+      const res = await authService.listAll('/api/memories');
       setItems(res.data);
     } catch (e) {
       console.error(e);
@@ -138,7 +138,7 @@ export default function Notes() {
 
   const load = async () => {
     try {
-      const r = await authService.api.get('/api/notes');
+      const r = await authService.listAll('/api/notes');
       setItems(r.data);
     } catch (e) {
       console.error(e);
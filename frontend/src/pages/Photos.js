@@ -657,7 +657,7 @@ export default function Photos() {
 
   const loadAlbums = async () => {
     try {
-      const res = await authService.api.get('/api/albums');
+      const res = await authService.listAll('/api/albums');
       setAlbums(res.data || []);
     } catch (e) {
       console.error(e);
@@ -667,7 +667,7 @@ export default function Photos() {
 
   const loadPhotos = async (albumId = null) => {
     try {
-      const res = await authService.api.get('/api/photos');
+      const res = await authService.listAll('/api/photos');
       let items = res.data || [];
       if (albumId) {
         items = items.filter(p => p.album_id === albumId);
@@ -272,7 +272,7 @@ export default function Reminders() {
 
   const load = async () => {
     try {
-      const r = await authService.api.get('/api/reminders');
+      const r = await authService.listAll('/api/reminders');
       setItems(r.data);
     } catch (e) {
       console.error(e);
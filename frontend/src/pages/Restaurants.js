@@ -648,7 +648,7 @@ export default function Restaurants() {
 
   const load = async () => {
     try {
-      const r = await authService.api.get('/api/restaurants');
+      const r = await authService.listAll('/api/restaurants');
       setItems(r.data);
     } catch (e) {
       console.error(e);
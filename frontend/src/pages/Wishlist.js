@@ -587,7 +587,7 @@ function Wishlist() {
 
   const loadWishlist = async () => {
     try {
-      const response = await authService.api.get('/api/wishlist');
+      const response = await authService.listAll('/api/wishlist');
       setWishlist(response.data);
     } catch (error) {
       console.error('Erreur lors du chargement de la wishlist:', error);
@@ -42,6 +42,17 @@ export const authService = {
 			return res.json();
 		}
 	},
+	// Follows X-Next-Cursor until the list is complete; resolves like api.get ({ data }).
+	async listAll(path, params = {}) {
+		const data = [];
+		let after = null;
+		do {
+			const res = await this.api.get(path, { params: after ? { ...params, after } : params });
+			data.push(...(res.data || []));
+			after = res.headers['x-next-cursor'] || null;
+		} while (after);
+		return { data };
+	},
 	setToken(token) {
 		localStorage.setItem('access_token', token);
 	},
@@ -0,0 +1,74 @@
+"""
+Gunicorn settings, read from the environment: `gunicorn -c gunicorn.conf.py 'app:create_app()'`.
+
+The app is never preloaded: gunicorn calls the `create_app()` factory in each worker
+after the fork, so every worker opens its own Mongo connection pool.
+
+GUNICORN_WORKER_CLASS=sync (default) keeps one request per worker process.
+GUNICORN_WORKER_CLASS=gevent serves GUNICORN_WORKER_CONNECTIONS requests per worker
+cooperatively: PyMongo, webpush (requests) and the SSE stream all yield on socket I/O.
+
+Password hashing (register/login) runs on a bounded pool so it does not starve other
+requests, but only gevent workers overlap requests: a sync worker is blocked for the
+whole hash and PASSWORD_HASH_MAX_INFLIGHT never applies.
+
+Live updates (/api/stream, SSE) need GUNICORN_WORKER_CLASS=gevent: under sync workers
+the endpoint answers 503, since one open stream would hold the worker and be killed at
+GUNICORN_TIMEOUT. Change events are published in-process only, so a stream sees only
+the writes handled by its own worker: keep WEB_CONCURRENCY=1 while the stream is used
+(a gevent worker already serves GUNICORN_WORKER_CONNECTIONS clients). With more
+workers, clients miss other workers' writes without any `reset` event and must rely
+on /api/sync polling.
+
+Monkey-patch safety under gevent:
+  - the worker patches the stdlib in `init_process`, after the fork and before the
+    app is imported, so the app must not be preloaded in the master;
+  - this file never imports app.py, pymongo or anything that opens sockets or threads;
+  - `post_worker_init` checks the patch took effect and stops the server otherwise.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "500"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+accesslog = os.getenv("GUNICORN_ACCESSLOG") or None
+
+ASYNC = worker_class in ("gevent", "gunicorn.workers.ggevent.GeventWorker")
+# a preloaded app would open Mongo in the master (and, under gevent, before the worker patches)
+preload_app = False
+
+# Prometheus multiprocess mode: workers write metric files here, any worker serves the sum
+PROMETHEUS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+    if PROMETHEUS_DIR:
+        os.makedirs(PROMETHEUS_DIR, exist_ok=True)
+        for name in os.listdir(PROMETHEUS_DIR):
+            if name.endswith(".db"):
+                os.remove(os.path.join(PROMETHEUS_DIR, name))
+
+
+def child_exit(server, worker):
+    if PROMETHEUS_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+PATCHED = ("socket", "ssl", "select", "threading", "time", "queue")
+
+
+def post_worker_init(worker):
+    if not ASYNC:
+        return
+    from gevent import monkey
+    missing = [m for m in PATCHED if not monkey.is_module_patched(m)]
+    if missing:
+        worker.log.critical("gevent monkey-patching incomplete (%s), refusing to serve", ", ".join(missing))
+        raise SystemExit(3)  # WORKER_BOOT_ERROR: the arbiter halts instead of respawning
+    worker.log.info("gevent worker %s patched, %s connections", worker.pid, worker_connections)
@@ -0,0 +1,198 @@
+"""
+Migrations versionnées de la base (index)
+À lancer une fois par déploiement : `python migrations.py`
+Statistiques d'utilisation des index : `python migrations.py --stats`
+"""
+
+import os, sys, datetime as dt
+
+from pymongo import MongoClient, ASCENDING as ASC, DESCENDING as DESC
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SYNC_TOMBSTONE_TTL = int(os.getenv("SYNC_TOMBSTONE_TTL", str(30 * 24 * 3600)))
+
+# Collections couple-scoped et champ de tri de leur route de liste
+LIST_SORTS = {
+    "reminders": "created_at",
+    "restaurants": "added_at",
+    "activities": "added_at",
+    "wishlist_items": "added_at",
+    "photos": "uploaded_at",
+    "albums": "created_at",
+    "memories": "date",
+    "notes": "created_at",
+}
+SYNCED = list(LIST_SORTS) + ["comments", "reactions"]
+
+
+def m001_compound_indexes(db):
+    """Index composés (couple_id + tri) pour chaque route de liste."""
+    db.users.create_index([("email", ASC)], unique=True)
+    db.users.create_index([("couple_id", ASC)])
+    db.couples.create_index([("invite_code", ASC)], unique=True)
+    for name, field in LIST_SORTS.items():
+        db[name].create_index([("couple_id", ASC), (field, DESC), ("_id", DESC)])
+    # éléments wishlist historiques sans couple_id (branche $or de wishlist_list)
+    db.wishlist_items.create_index([("added_by", ASC), ("added_at", DESC)])
+    db.comments.create_index([("couple_id", ASC), ("target_type", ASC), ("target_id", ASC), ("created_at", ASC)])
+    db.reactions.create_index([("couple_id", ASC), ("target_type", ASC), ("target_id", ASC)])
+    db.settings.create_index([("user_id", ASC)])
+    db.push_subscriptions.create_index([("couple_id", ASC)])
+    db.push_subscriptions.create_index([("user_email", ASC), ("endpoint", ASC)])
+
+
+def m002_sync_indexes(db):
+    """Synchronisation delta : updated_at par couple et tombstones expirées par TTL."""
+    for name in SYNCED:
+        # _id en dernier : /api/sync pagine en keyset sur (updated_at, _id)
+        db[name].create_index([("couple_id", ASC), ("updated_at", ASC), ("_id", ASC)])
+    db.tombstones.create_index([("couple_id", ASC), ("deleted_at", ASC)])
+    db.tombstones.create_index([("deleted_at", ASC)], expireAfterSeconds=SYNC_TOMBSTONE_TTL)
+
+
+def m003_drop_single_field_indexes(db):
+    """Supprime les index simples de l'ancien ensure_indexes, couverts par les index composés."""
+    for name in ("reminders", "restaurants", "activities", "wishlist_items", "photos", "notes", "push_subscriptions"):
+        existing = db[name].index_information()
+        for idx in ("couple_id_1", "created_at_-1", "added_at_-1", "uploaded_at_-1"):
+            if idx in existing and not (name == "push_subscriptions" and idx == "couple_id_1"):
+                db[name].drop_index(idx)
+
+
+def m004_drop_reaction_target_index(db):
+    """Réactions : supprime l'index cible de la migration 1 (la clé unique de la 5 le couvre)."""
+    if "couple_id_1_target_type_1_target_id_1" in db.reactions.index_information():
+        db.reactions.drop_index("couple_id_1_target_type_1_target_id_1")
+
+
+def m005_unique_reactions_and_counters(db):
+    """Réactions : clé unique pour le toggle atomique et compteurs par cible/emoji."""
+    key = ["couple_id", "target_type", "target_id", "emoji", "created_by"]
+    # supprime les doublons créés par l'ancien find_one + insert_one
+    dups = db.reactions.aggregate([
+        {"$group": {"_id": {k: f"${k}" for k in key}, "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    for d in dups:
+        db.reactions.delete_many({"_id": {"$in": d["ids"][1:]}})
+    db.reactions.create_index([(k, ASC) for k in key], unique=True)
+    # index cible + emoji créé par une ancienne version de la migration 4, couvert par la clé unique
+    if "couple_id_1_target_type_1_target_id_1_emoji_1" in db.reactions.index_information():
+        db.reactions.drop_index("couple_id_1_target_type_1_target_id_1_emoji_1")
+    db.reaction_counts.create_index([("couple_id", ASC), ("target_type", ASC), ("target_id", ASC)], unique=True)
+    rows = db.reactions.aggregate([
+        {"$match": {"active": {"$ne": False}}},
+        {"$group": {"_id": {"c": "$couple_id", "t": "$target_type", "i": "$target_id", "e": "$emoji"}, "n": {"$sum": 1}}},
+    ], allowDiskUse=True)
+    for r in rows:
+        k = r["_id"]
+        if "." in k["e"] or k["e"].startswith("$"):
+            continue
+        db.reaction_counts.update_one(
+            {"couple_id": k["c"], "target_type": k["t"], "target_id": k["i"]},
+            {"$set": {f"counts.{k['e']}": r["n"]}}, upsert=True
+        )
+
+
+# Recherche /api/search : un index texte par collection, préfixé par couple_id
+SEARCH_INDEXES = {
+    "notes":          {"content": 1},
+    "memories":       {"title": 5, "content": 1},
+    "reminders":      {"title": 5, "description": 1},
+    "restaurants":    {"name": 5, "address": 2, "notes": 1},
+    "activities":     {"title": 5, "notes": 1},
+    "wishlist_items": {"title": 5, "description": 1},
+}
+
+
+def m006_search_text_indexes(db):
+    """Index texte français (insensible aux accents) pour la recherche par couple."""
+    for name, weights in SEARCH_INDEXES.items():
+        db[name].create_index(
+            [("couple_id", ASC)] + [(f, "text") for f in weights],
+            weights=weights, default_language="french", language_override="search_language",
+            name=f"search_{name}",
+        )
+
+
+# Filtres et tris des routes de liste (LIST_FILTERS / LIST_SORTS de app.py) : égalité, puis tri
+FILTER_INDEXES = {
+    "reminders": [
+        [("status", ASC), ("created_at", DESC)],
+        [("priority", ASC), ("created_at", DESC)],
+        [("assigned_to", ASC), ("created_at", DESC)],
+        [("due_date", ASC)],
+        [("status", ASC), ("due_date", ASC)],
+    ],
+    "restaurants":    [[("status", ASC), ("added_at", DESC)], [("name", ASC)]],
+    "activities":     [[("category", ASC), ("added_at", DESC)], [("status", ASC), ("added_at", DESC)]],
+    "wishlist_items": [[("status", ASC), ("added_at", DESC)], [("recipient_id", ASC), ("added_at", DESC)]],
+    "photos":         [[("album_id", ASC), ("uploaded_at", DESC)]],
+    "notes":          [[("pinned", ASC), ("created_at", DESC)]],
+}
+
+
+def m007_list_filter_indexes(db):
+    """Index composés couple_id + filtre + tri pour les paramètres des routes de liste."""
+    for name, keys in FILTER_INDEXES.items():
+        for key in keys:
+            tail = DESC if key[-1][1] == DESC else ASC
+            db[name].create_index([("couple_id", ASC)] + key + [("_id", tail)])
+
+
+def m008_reminder_due_index(db):
+    """Rappels : index (status, due_date) pour le planificateur d'échéances."""
+    db.reminders.create_index([("status", ASC), ("due_date", ASC)])
+
+
+MIGRATIONS = [
+    (1, m001_compound_indexes),
+    (2, m002_sync_indexes),
+    (3, m003_drop_single_field_indexes),
+    (4, m004_drop_reaction_target_index),
+    (5, m005_unique_reactions_and_counters),
+    (6, m006_search_text_indexes),
+    (7, m007_list_filter_indexes),
+    (8, m008_reminder_due_index),
+]
+
+
+def get_db():
+    uri = os.getenv("MONGODB_URI") or os.getenv("MONGO_URI") or "mongodb://127.0.0.1:27017/"
+    return MongoClient(uri)[os.getenv("MONGODB_DB", "us_app")]
+
+
+def migrate(db):
+    """Applique les migrations manquantes, dans l'ordre ; retourne les versions appliquées."""
+    done = {d["_id"] for d in db.schema_migrations.find({}, {"_id": 1})}
+    applied = []
+    for version, fn in MIGRATIONS:
+        if version in done:
+            continue
+        print(f"🔧 Migration {version:03d} : {fn.__doc__.strip()}")
+        fn(db)
+        db.schema_migrations.insert_one({"_id": version, "name": fn.__name__, "applied_at": dt.datetime.utcnow()})
+        applied.append(version)
+    print(f"✅ Schéma à jour (version {MIGRATIONS[-1][0]}, {len(applied)} appliquée(s))")
+    return applied
+
+
+def index_stats(db):
+    """Utilisation de chaque index depuis le démarrage du serveur ($indexStats)."""
+    rows = []
+    for name in sorted(db.list_collection_names()):
+        for s in db[name].aggregate([{"$indexStats": {}}]):
+            rows.append({"collection": name, "index": s["name"], "ops": s["accesses"]["ops"], "since": s["accesses"]["since"]})
+    return rows
+
+
+if __name__ == "__main__":
+    database = get_db()
+    if "--stats" in sys.argv:
+        for r in index_stats(database):
+            flag = "  ⚠️ inutilisé" if r["ops"] == 0 else ""
+            print(f"{r['collection']:<22} {r['index']:<55} {r['ops']:>10}{flag}")
+    else:
+        migrate(database)
@@ -0,0 +1,69 @@
+"""gzip/brotli response compression with a cache of compressed bodies.
+
+Buffered responses of a compressible type above `min_size` are compressed with the
+best encoding the client accepts (brotli when the `brotli` module is installed,
+else gzip). Streamed responses and file passthrough are left alone. When the app
+supplies a cache key for the response (list routes: couple + ETag, which changes
+with every write), the compressed body is kept so repeated polls skip the work.
+"""
+
+import gzip
+
+from services.cache import TTLCache
+
+try:
+    import brotli  # type: ignore
+except Exception:
+    brotli = None
+
+COMPRESSIBLE = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+class Compressor:
+    def __init__(self, min_size=1024, gzip_level=6, br_level=5, cache_size=256, cache_ttl=300, cache_max_bytes=1 << 20):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.br_level = br_level
+        self.cache_max_bytes = cache_max_bytes
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.encodings = (["br"] if brotli else []) + ["gzip"]
+        self.stats = {"compressed": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def compress(self, data, encoding):
+        if encoding == "br":
+            return brotli.compress(data, quality=self.br_level)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def init_app(self, app, cache_key=None):
+        """Compress responses after every request; `cache_key()` returns a key or None."""
+        from flask import request
+
+        @app.after_request
+        def _compress(resp):
+            ctype = resp.mimetype or ""
+            if not ctype.startswith(COMPRESSIBLE):
+                return resp
+            resp.vary.add("Accept-Encoding")
+            if (resp.status_code != 200 or resp.direct_passthrough or resp.is_streamed
+                    or "Content-Encoding" in resp.headers or request.method == "HEAD"):
+                return resp
+            encoding = request.accept_encodings.best_match(self.encodings)
+            if not encoding:
+                return resp
+            data = resp.get_data()
+            if len(data) < self.min_size:
+                return resp
+            key = cache_key() if cache_key else None
+            body = self.cache.get((key, encoding)) if key else None
+            if body is None:
+                body = self.compress(data, encoding)
+                if key and len(body) <= self.cache_max_bytes:
+                    self.cache.set((key, encoding), body)
+            if len(body) >= len(data):
+                return resp
+            resp.set_data(body)
+            resp.headers["Content-Encoding"] = encoding
+            self.stats["compressed"] += 1
+            self.stats["bytes_in"] += len(data)
+            self.stats["bytes_out"] += len(body)
+            return resp
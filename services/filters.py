@@ -0,0 +1,48 @@
+"""Declarative query-string filters and sorts for list endpoints.
+
+A spec maps a field to its allowed values (a list, usually a model enum), `str`
+for free ids or `bool`. `?status=pending,done` becomes `{"status": {"$in": [...]}}`;
+`?sort=due_date` sorts ascending and `?sort=-due_date` descending.
+"""
+
+TRUE = ("1", "true", "yes")
+FALSE = ("0", "false", "no")
+
+
+class FilterError(ValueError):
+    def __init__(self, error, field, allowed=None):
+        super().__init__(error)
+        self.payload = {"error": error, "field": field}
+        if allowed is not None:
+            self.payload["allowed"] = list(allowed)
+
+
+def parse_filters(args, spec):
+    """Mongo conditions for the spec'd fields present in `args` (a MultiDict)."""
+    query = {}
+    for field, kind in spec.items():
+        raw = args.get(field)
+        if raw is None or raw == "":
+            continue
+        if kind is bool:
+            if raw.lower() not in TRUE + FALSE:
+                raise FilterError("invalid_filter", field, ["true", "false"])
+            query[field] = raw.lower() in TRUE
+            continue
+        values = [v.strip() for v in raw.split(",") if v.strip()]
+        if kind is not str:
+            bad = [v for v in values if v not in kind]
+            if bad:
+                raise FilterError("invalid_filter", field, kind)
+        query[field] = values[0] if len(values) == 1 else {"$in": values}
+    return query
+
+
+def parse_sort(raw, allowed, field, direction):
+    """`(field, direction)` from `?sort=[-]field`; the route default when absent."""
+    if not raw:
+        return field, direction
+    name = raw.lstrip("-+ ")
+    if name not in allowed:
+        raise FilterError("invalid_sort", name, allowed)
+    return name, -1 if raw.startswith("-") else 1
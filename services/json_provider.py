@@ -0,0 +1,78 @@
+"""Flask JSON provider with native ObjectId/datetime encoding.
+
+Uses orjson when it is installed (JSON_ENGINE=orjson, the default) and falls back
+to the stdlib encoder otherwise. Both engines produce the same output: ObjectIds
+as their hex string and datetimes as ISO 8601, naive values being UTC.
+"""
+
+import json, datetime as dt
+from itertools import islice
+from bson.objectid import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson  # type: ignore
+except Exception:
+    orjson = None
+
+_ORJSON_OPTS = (orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def _default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, dt.datetime):
+        return (o if o.tzinfo else o.replace(tzinfo=dt.timezone.utc)).isoformat()
+    if isinstance(o, dt.date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    sort_keys = False
+    default = staticmethod(_default)
+
+    def __init__(self, app, engine="orjson"):
+        super().__init__(app)
+        self.use_orjson = bool(orjson) and engine == "orjson"
+
+    def dumps_bytes(self, obj):
+        if self.use_orjson:
+            return orjson.dumps(obj, default=_default, option=_ORJSON_OPTS)
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return self.dumps_bytes(obj).decode()
+        kwargs.setdefault("default", _default)
+        kwargs.setdefault("ensure_ascii", False)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def stream_array(self, docs, chunk=200, expand=None):
+        """Encode an iterable (e.g. a PyMongo cursor) as a JSON array, `chunk` documents per piece.
+
+        Only one chunk is held in memory at a time; `expand(batch)` may rewrite each batch.
+        """
+        it = iter(docs)
+        yield b"["
+        first = True
+        while True:
+            batch = list(islice(it, chunk))
+            if not batch:
+                break
+            if expand:
+                batch = expand(batch)
+            if batch:
+                body = self.dumps_bytes(batch)[1:-1]  # compact encoding: strip the brackets
+                yield body if first else b"," + body
+                first = False
+        yield b"]"
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
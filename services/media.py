@@ -0,0 +1,140 @@
+"""Content-addressed upload storage with resized image variants.
+
+Uploads are streamed to disk while being hashed and stored as `<sha256><ext>`
+in a flat directory, so identical files are written once. The hash is salted with
+a caller-supplied scope (the couple), so a name reveals nothing about whether
+another scope holds the same file. Thumbnail and preview
+variants (`<sha256>.<variant>.webp`, or `.jpg` without WebP support) are built in
+a process pool when Pillow is installed. Pool workers are started by a fork server
+(spawn where that is unavailable), never forked from the app process, whose
+threads may hold locks the child would inherit. Under gevent monkey-patching a
+process pool is not safe, so gevent's native-thread pool is used instead.
+"""
+
+import hashlib, multiprocessing, os, threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from uuid import uuid4
+
+try:
+    from PIL import Image, ImageOps, features  # type: ignore
+except Exception:
+    Image = None
+
+try:
+    from gevent import monkey as _monkey  # type: ignore
+    from gevent.threadpool import ThreadPoolExecutor as NativeThreadPool  # type: ignore
+except Exception:
+    _monkey = None
+
+VARIANTS = {"thumb": 320, "preview": 1280}
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".tif", ".tiff"}
+CHUNK = 64 * 1024
+
+
+def _variant_format():
+    if Image and features.check("webp"):
+        return "WEBP", ".webp"
+    return "JPEG", ".jpg"
+
+
+def variant_names(digest):
+    _, ext = _variant_format()
+    return {v: f"{digest}.{v}{ext}" for v in VARIANTS}
+
+
+def build_variants(src, upload_dir, digest, quality=80):
+    """Runs in a worker process: write missing variants, return {variant: filename}."""
+    if not Image:
+        return {}
+    fmt, _ = _variant_format()
+    names = variant_names(digest)
+    try:
+        with Image.open(src) as im:
+            im = ImageOps.exif_transpose(im)
+            for variant, size in VARIANTS.items():
+                dest = os.path.join(upload_dir, names[variant])
+                if os.path.exists(dest):
+                    continue
+                copy = im.copy()
+                copy.thumbnail((size, size))
+                if fmt == "JPEG" and copy.mode not in ("RGB", "L"):
+                    copy = copy.convert("RGB")
+                tmp = f"{dest}.{uuid4().hex}.tmp"
+                copy.save(tmp, fmt, quality=quality)
+                os.replace(tmp, dest)
+    except Exception:
+        return {}
+    return names
+
+
+class MediaPipeline:
+    """`store()` saves an upload; `variants()` returns a Future of its variant filenames."""
+
+    def __init__(self, upload_dir, workers=2, quality=80):
+        self.upload_dir = upload_dir
+        self.workers = workers
+        self.quality = quality
+        self._pool = None
+        self._pid = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def store(self, f, scope=b""):
+        """Stream `f` (a werkzeug FileStorage) to disk; returns `(filename, digest)`."""
+        ext = os.path.splitext(f.filename or '')[1][:8].lower()
+        h = hashlib.sha256(scope + b"\0" if scope else b"")
+        tmp = os.path.join(self.upload_dir, f".{uuid4().hex}.part")
+        try:
+            with open(tmp, "wb") as out:
+                for chunk in iter(lambda: f.stream.read(CHUNK), b""):
+                    h.update(chunk)
+                    out.write(chunk)
+            digest = h.hexdigest()
+            name = f"{digest}{ext}"
+            dest = os.path.join(self.upload_dir, name)
+            if os.path.exists(dest):
+                os.remove(tmp)
+            else:
+                os.replace(tmp, dest)
+        except Exception:
+            if os.path.exists(tmp): os.remove(tmp)
+            raise
+        return name, digest
+
+    def _executor(self):
+        if self._pid != os.getpid():
+            if _monkey and _monkey.is_module_patched("threading"):
+                # real OS threads; Pillow releases the GIL while resizing and encoding
+                self._pool = NativeThreadPool(max_workers=self.workers)
+            else:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+            self._pid = os.getpid()
+            self._jobs = {}
+        return self._pool
+
+    def variants(self, name):
+        """Future resolving to {variant: filename}; empty for non-images or without Pillow."""
+        digest, ext = os.path.splitext(name)
+        if not Image or ext.lower() not in IMAGE_EXTS:
+            return _done({})
+        names = variant_names(digest)
+        if all(os.path.exists(os.path.join(self.upload_dir, n)) for n in names.values()):
+            return _done(names)
+        src = os.path.join(self.upload_dir, name)
+        with self._lock:
+            if self.workers <= 0:
+                return _done(build_variants(src, self.upload_dir, digest, self.quality))
+            pool = self._executor()
+            fut = self._jobs.get(digest)
+            if fut is None:
+                fut = pool.submit(build_variants, src, self.upload_dir, digest, self.quality)
+                self._jobs[digest] = fut
+                fut.add_done_callback(lambda _f, d=digest: self._jobs.pop(d, None))
+            return fut
+
+
+def _done(value):
+    fut = Future()
+    fut.set_result(value)
+    return fut
@@ -0,0 +1,150 @@
+"""Prometheus metrics: HTTP routes, Mongo commands and pool waits, push sends, uploads.
+
+Uses prometheus_client when it is installed; otherwise every recording call is a
+no-op and `/metrics` answers 501. Under gunicorn set PROMETHEUS_MULTIPROC_DIR so
+all workers write to shared files and any worker can serve the aggregated scrape
+(gunicorn.conf.py wipes the directory on start and marks exited workers dead).
+"""
+
+import os, threading, time
+
+from pymongo import monitoring
+
+from services.push_queue import is_gone, is_transient
+
+try:
+    import prometheus_client as prom  # type: ignore
+    from prometheus_client import multiprocess  # type: ignore
+except Exception:
+    prom = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+SIZE_BUCKETS = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6, 64e6)
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = prom is not None
+        if not self.enabled:
+            return
+        self.http_requests = prom.Counter(
+            "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"])
+        self.http_latency = prom.Histogram(
+            "http_request_duration_seconds", "HTTP request latency by route", ["method", "route"], buckets=LATENCY_BUCKETS)
+        self.mongo_latency = prom.Histogram(
+            "mongodb_command_duration_seconds", "Mongo command duration by collection and command",
+            ["collection", "command"], buckets=MONGO_BUCKETS)
+        self.mongo_failures = prom.Counter(
+            "mongodb_command_failures_total", "Failed Mongo commands", ["collection", "command"])
+        self.pool_wait = prom.Histogram(
+            "mongodb_pool_checkout_wait_seconds", "Time spent checking a connection out of the pool", buckets=MONGO_BUCKETS)
+        self.push_latency = prom.Histogram(
+            "push_send_duration_seconds", "Web push send latency", ["outcome"], buckets=LATENCY_BUCKETS)
+        self.push_failures = prom.Counter(
+            "push_send_failures_total", "Web push sends that failed", ["reason"])
+        self.upload_bytes = prom.Histogram(
+            "upload_size_bytes", "Size of stored uploads", buckets=SIZE_BUCKETS)
+        self.upload_latency = prom.Histogram(
+            "upload_save_duration_seconds", "Time to hash and store one upload", buckets=LATENCY_BUCKETS)
+
+    def listeners(self):
+        """PyMongo event listeners to pass to the client (none when disabled)."""
+        return [CommandMetrics(self)] if self.enabled else []
+
+    # ── recording ──
+    def observe_request(self, method, route, status, seconds):
+        if self.enabled:
+            self.http_requests.labels(method, route, str(status)).inc()
+            self.http_latency.labels(method, route).observe(seconds)
+
+    def observe_command(self, collection, command, seconds, failed=False):
+        if self.enabled:
+            self.mongo_latency.labels(collection, command).observe(seconds)
+            if failed: self.mongo_failures.labels(collection, command).inc()
+
+    def observe_pool_wait(self, seconds):
+        if self.enabled:
+            self.pool_wait.observe(seconds)
+
+    def observe_push(self, seconds, error=None):
+        if self.enabled:
+            self.push_latency.labels("error" if error else "ok").observe(seconds)
+            if error: self.push_failures.labels(push_reason(error)).inc()
+
+    def observe_upload(self, size, seconds):
+        if self.enabled:
+            self.upload_bytes.observe(size)
+            self.upload_latency.observe(seconds)
+
+    # ── exposition ──
+    def init_app(self, app, path="/metrics", token=None):
+        """Time every request and serve the scrape at `path` (Bearer `token` if set)."""
+        from flask import Response, g, request
+
+        @app.before_request
+        def _metrics_start():
+            g._metrics_t0 = time.perf_counter()
+
+        @app.after_request
+        def _metrics_record(resp):
+            t0 = g.pop("_metrics_t0", None)
+            if t0 is not None and request.path != path:
+                route = request.url_rule.rule if request.url_rule else "unmatched"
+                self.observe_request(request.method, route, resp.status_code, time.perf_counter() - t0)
+            return resp
+
+        @app.get(path)
+        def metrics():
+            if token and request.headers.get("Authorization") != f"Bearer {token}":
+                return {"error": "unauthorized"}, 401
+            if not self.enabled:
+                return {"error": "prometheus_client_not_installed"}, 501
+            body, ctype = self.render()
+            return Response(body, content_type=ctype)
+
+    def render(self):
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            registry = prom.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = prom.REGISTRY
+        return prom.generate_latest(registry), prom.CONTENT_TYPE_LATEST
+
+
+def push_reason(error):
+    """Low-cardinality failure label for a send_push error string."""
+    if str(error).startswith("missing_webpush"):
+        return "not_configured"
+    if is_gone(error):
+        return "gone"
+    if is_transient(error):
+        return "transient"
+    return "error"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Times every Mongo command, labelled by collection and command name."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        cmd = event.command
+        target = cmd.get("collection") if event.command_name == "getMore" else cmd.get(event.command_name)
+        collection = target if isinstance(target, str) else "-"
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event, failed):
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        self.metrics.observe_command(collection, event.command_name, event.duration_micros / 1e6, failed)
+
+    def succeeded(self, event):
+        self._finish(event, False)
+
+    def failed(self, event):
+        self._finish(event, True)
@@ -0,0 +1,161 @@
+"""Fork-safe MongoClient holder with pool settings from the environment.
+
+PyMongo clients must not cross a fork: the client is opened on first use in the
+process that uses it, so a gunicorn master (even with preload) never hands its
+sockets or monitor threads to the workers. Collections are handed out as light
+proxies so module-level `users_col = mongo.collection("users")` stays valid.
+"""
+
+import os, threading
+
+from pymongo import MongoClient, monitoring
+
+
+def client_options(env=os.environ):
+    """MongoClient keyword arguments from MONGO_* variables; unset ones keep PyMongo defaults."""
+    spec = {
+        "maxPoolSize":              ("MONGO_MAX_POOL_SIZE", int),
+        "minPoolSize":              ("MONGO_MIN_POOL_SIZE", int),
+        "maxIdleTimeMS":            ("MONGO_MAX_IDLE_TIME_MS", int),
+        "maxConnecting":            ("MONGO_MAX_CONNECTING", int),
+        "waitQueueTimeoutMS":       ("MONGO_WAIT_QUEUE_TIMEOUT_MS", int),
+        "serverSelectionTimeoutMS": ("MONGO_SERVER_SELECTION_TIMEOUT_MS", int),
+        "connectTimeoutMS":         ("MONGO_CONNECT_TIMEOUT_MS", int),
+        "socketTimeoutMS":          ("MONGO_SOCKET_TIMEOUT_MS", int),
+        "compressors":              ("MONGO_COMPRESSORS", str),  # e.g. "zstd,snappy,zlib"
+        "zlibCompressionLevel":     ("MONGO_ZLIB_LEVEL", int),
+        "appname":                  ("MONGO_APPNAME", str),
+    }
+    opts = {}
+    for key, (var, cast) in spec.items():
+        raw = env.get(var, "").strip()
+        if raw:
+            opts[key] = cast(raw)
+    return opts
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection checkout wait times and pool churn, aggregated per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.observers = []  # callables(seconds) fed every successful checkout wait
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.created = 0
+        self.closed = 0
+        self.cleared = 0
+
+    def connection_checked_out(self, event):
+        wait = event.duration  # seconds spent in checkout, including waiting for a free connection
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+        for fn in self.observers:
+            fn(wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock: self.failed += 1
+
+    def connection_created(self, event):
+        with self._lock: self.created += 1
+
+    def connection_closed(self, event):
+        with self._lock: self.closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock: self.cleared += 1
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_checked_in(self, event): pass
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failed": self.failed,
+                "wait_ms_avg": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_max * 1000, 3),
+                "connections_open": self.created - self.closed,
+                "pool_cleared": self.cleared,
+            }
+
+
+class Mongo:
+    """Owns one MongoClient per process; `client`/`db` (re)open it after a fork."""
+
+    def __init__(self, uri, db_name, listeners=(), **options):
+        self.uri = uri
+        self.db_name = db_name
+        self.options = options
+        self.listeners = list(listeners)
+        self.pool_stats = PoolStats()
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # a client inherited from the parent is dropped, not closed: its sockets are the parent's
+                    if self._client is not None:
+                        self.pool_stats.reset()
+                    self._client = MongoClient(self.uri, event_listeners=[self.pool_stats, *self.listeners], **self.options)
+                    self._pid = os.getpid()
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    def connect(self):
+        """Open the client now (in the calling process) instead of on the first query."""
+        return self.client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = self._pid = None
+
+    def collection(self, name):
+        return LazyCollection(self, name)
+
+
+class LazyCollection:
+    """Stands in for `db[name]`, bound to whichever client the current process owns."""
+
+    __slots__ = ("_mongo", "name", "_col", "_client")
+
+    def __init__(self, mongo, name):
+        self._mongo = mongo
+        self.name = name
+        self._col = self._client = None
+
+    def _target(self):
+        client = self._mongo.client
+        if self._client is not client:
+            self._col = client[self._mongo.db_name][self.name]
+            self._client = client
+        return self._col
+
+    def __getattr__(self, attr):
+        return getattr(self._target(), attr)
+
+    def __getitem__(self, sub):
+        return self._target()[sub]
+
+    def __repr__(self):
+        return f"LazyCollection({self._mongo.db_name}.{self.name})"
@@ -0,0 +1,59 @@
+"""Opaque keyset cursors for list endpoints.
+
+A cursor encodes the sort value and `_id` of the last document of a page; the
+next page is everything strictly after that pair in `(field, _id)` order.
+"""
+
+import base64, json, datetime as dt
+from bson.objectid import ObjectId
+
+
+def encode_cursor(value, _id):
+    if isinstance(value, dt.datetime):
+        value = {"$d": value.isoformat()}
+    elif isinstance(value, ObjectId):
+        value = {"$o": str(value)}
+    raw = json.dumps([value, str(_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return `(value, ObjectId)`; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        value, _id = json.loads(raw)
+        if isinstance(value, dict) and "$d" in value:
+            value = dt.datetime.fromisoformat(value["$d"])
+        elif isinstance(value, dict) and "$o" in value:
+            value = ObjectId(value["$o"])
+        return value, ObjectId(_id)
+    except Exception as e:
+        raise ValueError("invalid_cursor") from e
+
+
+def keyset_filter(field, value, _id, direction=-1):
+    """Mongo filter for documents after `(value, _id)` in the given sort direction.
+
+    Documents missing `field` sort as null: last when descending, first when ascending.
+    """
+    if direction < 0:
+        if value is None:
+            return {field: None, "_id": {"$lt": _id}}
+        return {"$or": [{field: {"$lt": value}}, {field: value, "_id": {"$lt": _id}}, {field: None}]}
+    if value is None:
+        return {"$or": [{field: None, "_id": {"$gt": _id}}, {field: {"$ne": None}}]}
+    return {"$or": [{field: {"$gt": value}}, {field: value, "_id": {"$gt": _id}}]}
+
+
+def fetch_page(col, query, field, direction=-1, limit=50, after=None, projection=None):
+    """Run one keyset page; returns `(docs, next_cursor_or_None)`."""
+    if after:
+        value, _id = decode_cursor(after)
+        query = {"$and": [query, keyset_filter(field, value, _id, direction)]}
+    cur = col.find(query, projection).sort([(field, direction), ("_id", direction)]).limit(limit + 1)
+    docs = list(cur)
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, encode_cursor(last.get(field), last["_id"])
@@ -0,0 +1,99 @@
+"""Password hashing on a bounded executor.
+
+Werkzeug's scrypt/pbkdf2 hashes cost tens of milliseconds of CPU on purpose.
+They run on a small thread pool (hashlib releases the GIL, so the pool really
+uses other cores; under gevent it is gevent's native-thread pool so the hub keeps
+serving). A semaphore caps in-flight hashes: past the cap, callers wait at most
+`wait` seconds and then get `HasherBusy` instead of piling up behind a login burst.
+
+Both only help when one process serves concurrent requests (gevent workers, or
+a threaded server). A sync gunicorn worker handles one request at a time: the
+cap never engages and the worker is still blocked for the whole hash, so there
+the other routes are kept responsive only by having more worker processes.
+
+The algorithm and cost come from a Werkzeug method string such as
+"scrypt:32768:8:1" or "pbkdf2:sha256:600000"; hashes made with another method or
+cost are reported by `needs_rehash()` so logins can upgrade them.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+try:
+    from gevent import monkey as _monkey  # type: ignore
+    from gevent.threadpool import ThreadPoolExecutor as NativeThreadPool  # type: ignore
+except Exception:
+    _monkey = None
+
+
+class HasherBusy(Exception):
+    """Too many hashes in flight; the caller should answer 503."""
+
+
+def method_prefix(method):
+    """The method part Werkzeug writes for `method`, with its defaults filled in
+    ("scrypt" -> "scrypt:32768:8:1", "pbkdf2" -> "pbkdf2:sha256:<iterations>")."""
+    name, *args = method.split(":")
+    if name == "scrypt" and not args:
+        args = ["32768", "8", "1"]
+    elif name == "pbkdf2":
+        args = (args or ["sha256"]) + ([str(DEFAULT_PBKDF2_ITERATIONS)] if len(args) < 2 else [])
+    return ":".join([name] + args)
+
+
+class PasswordHasher:
+    def __init__(self, method="scrypt", workers=2, max_inflight=8, wait=2.0):
+        self.method = method
+        self.workers = workers
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._pool = None
+        self._prefix = method_prefix(method)
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    if _monkey and _monkey.is_module_patched("threading"):
+                        self._pool = NativeThreadPool(max_workers=self.workers)
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwhash")
+        return self._pool
+
+    def _run(self, fn, *args, block=True):
+        if not self._slots.acquire(timeout=self.wait if block else 0):
+            raise HasherBusy()
+        try:
+            fut = self._executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _f: self._slots.release())
+        return fut
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method).result()
+
+    def verify(self, stored, password):
+        if not stored:
+            return False
+        return self._run(check_password_hash, stored, password).result()
+
+    def needs_rehash(self, stored):
+        """True when `stored` was made with another algorithm or cost than `method`."""
+        return (stored or "").split("$", 1)[0] != self._prefix
+
+    def rehash_later(self, password, on_done):
+        """Hash in the background and call `on_done(new_hash)`; skipped when the pool is busy."""
+        try:
+            fut = self._run(generate_password_hash, password, self.method, block=False)
+        except HasherBusy:
+            return False
+        def done(f):
+            if f.exception() is None:
+                on_done(f.result())
+        fut.add_done_callback(done)
+        return True
@@ -0,0 +1,88 @@
+"""In-process per-couple pub/sub feeding the SSE stream.
+
+Events get per-couple ids `<boot>-<seq>`; a bounded history per couple lets a reconnecting
+client resume from `Last-Event-ID`. Only subscribers in the same process see an
+event, so the stream is meant to be served by a single async worker process.
+"""
+
+import os, queue, threading
+from collections import deque
+from uuid import uuid4
+
+
+class Subscription:
+    def __init__(self, broker, key, maxsize):
+        self.broker = broker
+        self.key = key
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout):
+        """Next event or None after `timeout` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class CoupleBroker:
+    def __init__(self, history=200, queue_size=500):
+        self.history = history
+        self.queue_size = queue_size
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # a forked worker starts with its own id space and no inherited subscribers
+        self.boot = uuid4().hex[:8]
+        self._seq = {}
+        self._subs = {}
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key):
+        sub = Subscription(self, key, self.queue_size)
+        with self._lock:
+            self._subs.setdefault(key, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subs.get(sub.key)
+            if subs:
+                subs.discard(sub)
+                if not subs: del self._subs[sub.key]
+
+    def publish(self, key, data):
+        with self._lock:
+            seq = self._seq[key] = self._seq.get(key, 0) + 1
+            event = {"id": f"{self.boot}-{seq}", "data": data}
+            self._recent.setdefault(key, deque(maxlen=self.history)).append(event)
+            subs = list(self._subs.get(key, ()))
+        for sub in subs:
+            try:
+                sub.queue.put_nowait(event)
+            except queue.Full:
+                pass  # slow consumer: it will resync via the list/sync endpoints
+        return event
+
+    def replay(self, key, last_id):
+        """Events after `last_id`, or None when they are no longer (or never were) here."""
+        try:
+            boot, seq = last_id.rsplit("-", 1)
+            seq = int(seq)
+        except (AttributeError, ValueError):
+            return None
+        if boot != self.boot:
+            return None
+        with self._lock:
+            recent = list(self._recent.get(key, ()))
+        if recent and int(recent[0]["id"].rsplit("-", 1)[1]) > seq + 1:
+            return None
+        return [e for e in recent if int(e["id"].rsplit("-", 1)[1]) > seq]
+
+    def subscribers(self):
+        with self._lock:
+            return sum(len(s) for s in self._subs.values())
@@ -0,0 +1,114 @@
+"""Background fan-out of web push notifications.
+
+Request handlers only enqueue a job; a small pool of daemon threads resolves the
+couple's subscriptions and delivers them, retrying transient failures with
+exponential backoff and pruning subscriptions the push service reports as gone.
+"""
+
+import os, queue, random, threading, time
+
+
+def is_gone(err):
+    """410/404 or 'expired' from the push service: the subscription is dead."""
+    if not err: return False
+    s = str(err)
+    return '410' in s or '404' in s or 'expired' in s.lower()
+
+
+def is_transient(err):
+    """Timeouts, connection errors, 429 and 5xx are worth another attempt."""
+    if not err: return False
+    s = str(err).lower()
+    if any(code in s for code in ('429', '500', '502', '503', '504')): return True
+    return any(w in s for w in ('timeout', 'timed out', 'connection', 'temporarily'))
+
+
+class PushDispatcher:
+    """Bounded job queue drained by a worker pool.
+
+    `load_subs(couple_id)` returns subscription documents, `send(sub, payload)`
+    returns `(ok, err)` like `send_push`, `prune(sub)` removes a dead one.
+    Workers are started lazily in the process that enqueues, so the dispatcher
+    survives gunicorn forking a preloaded app.
+    """
+
+    def __init__(self, load_subs, send, prune, workers=4, maxsize=1000,
+                 retries=3, backoff=0.5, log=None):
+        self.load_subs = load_subs
+        self.send = send
+        self.prune = prune
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self.retries = retries
+        self.backoff = backoff
+        self.log = log or (lambda *a: None)
+        self.stats = {"queued": 0, "dropped": 0, "sent": 0, "failed": 0, "pruned": 0, "retried": 0}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.maxsize)
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"push-{i}", daemon=True)
+                t.start()
+            self._pid = os.getpid()
+
+    def submit(self, couple_id, author_email, payload, exclude_author=True):
+        """Queue a broadcast; returns False when the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((couple_id, author_email, payload, exclude_author))
+        except queue.Full:
+            self._count("dropped")
+            self.log('[PUSH][QUEUE] full, dropping', payload.get('type'))
+            return False
+        self._count("queued")
+        return True
+
+    def _count(self, key):
+        # bumped from request handlers and every worker thread; `+=` alone can lose updates
+        with self._lock:
+            self.stats[key] += 1
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._broadcast(*job)
+            except Exception as e:
+                self.log('[PUSH][WORKER][ERROR]', e)
+            finally:
+                self._queue.task_done()
+
+    def _broadcast(self, couple_id, author_email, payload, exclude_author):
+        for s in self.load_subs(couple_id):
+            if exclude_author and s.get('user_email') == author_email:
+                continue
+            self._deliver(s, payload)
+
+    def _deliver(self, sub, payload):
+        for attempt in range(self.retries + 1):
+            ok, err = self.send(sub.get('subscription', {}), payload)
+            if ok:
+                self._count("sent")
+                return True
+            if is_gone(err):
+                self.prune(sub)
+                self._count("pruned")
+                return False
+            if attempt < self.retries and is_transient(err):
+                self._count("retried")
+                time.sleep(self.backoff * (2 ** attempt) * (1 + random.random() / 2))
+                continue
+            break
+        self._count("failed")
+        return False
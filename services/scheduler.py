@@ -0,0 +1,118 @@
+"""Due-date reminder scheduler.
+
+Every process runs one scheduler thread. It scans pending reminders due within
+`lookahead` (index `status + due_date`), keeps them in a heap ordered by due date
+and sleeps until the next one. At fire time each reminder is claimed with an
+atomic lease (`fire_lease: {owner, until}`) so only one worker of one process
+sends it; claimed reminders are handed to `notify(couple_id, reminders)` in one
+batch per couple, then stamped `notified_at` (and `updated_at`) and reported to
+`changed(couple_id, ids)` so list ETags and delta sync see the write. If the owner dies before stamping,
+the lease expires and another worker picks the reminder up again.
+"""
+
+import datetime as dt, heapq, os, socket, threading, time
+from uuid import uuid4
+
+from pymongo import ReturnDocument
+
+
+class ReminderScheduler:
+    def __init__(self, col, notify, changed=None, interval=60, lookahead=600, grace=3600, lease=120, batch=500, log=None):
+        self.col = col
+        self.notify = notify
+        self.changed = changed or (lambda cid, ids: None)
+        self.interval = interval
+        self.lookahead = dt.timedelta(seconds=lookahead)
+        self.grace = dt.timedelta(seconds=grace)
+        self.lease = dt.timedelta(seconds=lease)
+        self.batch = batch
+        self.log = log or (lambda *a: None)
+        self.stats = {"scans": 0, "queued": 0, "claimed": 0, "fired": 0, "lost": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start(self):
+        """Start the thread in this process (no-op if already running here)."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+            self._heap = []
+            self._queued = {}
+            self._wake = threading.Event()
+            threading.Thread(target=self._run, name="reminder-scheduler", daemon=True).start()
+            self._pid = os.getpid()
+
+    def poke(self):
+        """Rescan soon, e.g. after a reminder was created or its due date changed."""
+        if self._pid == os.getpid():
+            self._wake.set()
+
+    def pending(self):
+        return len(self._heap) if self._pid == os.getpid() else 0
+
+    def _run(self):
+        next_scan = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_scan or self._wake.is_set():
+                    self._wake.clear()
+                    self.scan(dt.datetime.utcnow())
+                    next_scan = time.monotonic() + self.interval
+                self.fire_due(dt.datetime.utcnow())
+                timeout = next_scan - time.monotonic()
+                if self._heap:
+                    timeout = min(timeout, (self._heap[0][0] - dt.datetime.utcnow()).total_seconds())
+                # floor so a burst of pokes or a clock edge never spins the loop
+                self._wake.wait(max(0.5, timeout))
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.log('[SCHEDULER][ERROR]', e)
+                time.sleep(min(self.interval, 30))
+
+    def scan(self, now):
+        self.stats["scans"] += 1
+        cur = self.col.find(
+            {"status": "pending", "notified_at": None, "due_date": {"$gte": now - self.grace, "$lte": now + self.lookahead}},
+            {"_id": 1, "due_date": 1},
+        ).sort("due_date", 1).limit(self.batch)
+        for d in cur:
+            if self._queued.get(d["_id"]) != d["due_date"]:
+                self._queued[d["_id"]] = d["due_date"]
+                heapq.heappush(self._heap, (d["due_date"], d["_id"]))
+                self.stats["queued"] += 1
+
+    def fire_due(self, now):
+        claimed = {}
+        while self._heap and self._heap[0][0] <= now:
+            due, rid = heapq.heappop(self._heap)
+            if self._queued.get(rid) == due:
+                del self._queued[rid]
+            doc = self.claim(rid, due, now)
+            if doc:
+                claimed.setdefault(doc["couple_id"], []).append(doc)
+        for cid, docs in claimed.items():
+            if self.notify(cid, docs):
+                ids = [d["_id"] for d in docs]
+                res = self.col.update_many(
+                    {"_id": {"$in": ids}, "fire_lease.owner": self.owner},
+                    {"$set": {"notified_at": now, "updated_at": dt.datetime.utcnow()}, "$unset": {"fire_lease": ""}},
+                )
+                if res.modified_count:
+                    self.changed(cid, ids)
+                self.stats["fired"] += len(docs)
+            # otherwise the lease runs out and the next scan in the grace window retries
+
+    def claim(self, rid, due, now):
+        """Take the fire lease on one reminder; None if it changed, fired or is leased elsewhere."""
+        doc = self.col.find_one_and_update(
+            {"_id": rid, "status": "pending", "notified_at": None, "due_date": due,
+             "$or": [{"fire_lease": None}, {"fire_lease.until": {"$lt": now}}]},
+            {"$set": {"fire_lease": {"owner": self.owner, "until": now + self.lease}}},
+            projection={"title": 1, "couple_id": 1, "priority": 1, "assigned_to": 1, "due_date": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        self.stats["claimed" if doc else "lost"] += 1
+        return doc
@@ -0,0 +1,56 @@
+"""Helpers for /api/search: accent folding, query terms and result snippets.
+
+Matching and ranking are done by Mongo text indexes (French stemming, diacritic
+insensitive); these helpers only pick and trim the passage shown to the user.
+"""
+
+import re, unicodedata
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def fold(text):
+    """Lowercase without diacritics ("Crème Brûlée" -> "creme brulee"), same length as `text`."""
+    out = []
+    for ch in text or "":
+        base = "".join(c for c in unicodedata.normalize("NFD", ch) if not unicodedata.combining(c)) or ch
+        out.append(base.lower()[0])
+    return "".join(out)
+
+
+def query_terms(q):
+    """Positive terms of a `$text` search string, folded (negated `-terms` are dropped)."""
+    terms = []
+    for raw in re.findall(r'-?"[^"]*"|-?\S+', q or ""):
+        if raw.startswith("-"):
+            continue
+        terms += [t for t in _WORD.findall(fold(raw.strip('"'))) if len(t) > 1]
+    return terms
+
+
+def snippet(text, terms, width=160):
+    """A window of `text` around the first term (prefix match, so stems and plurals hit)."""
+    text = " ".join((text or "").split())
+    if len(text) <= width:
+        return text
+    folded = fold(text)
+    hit = None
+    for t in terms:
+        m = re.search(r"\b" + re.escape(t[:max(3, len(t) - 2)]), folded)
+        if m and (hit is None or m.start() < hit):
+            hit = m.start()
+    if hit is None:
+        return text[:width].rsplit(" ", 1)[0] + "…"
+    start = max(0, hit - width // 3)
+    if start:
+        start = text.find(" ", start) + 1 or start
+    end = start + width
+    if end < len(text):
+        cut = text.rfind(" ", start, end)
+        end = cut if cut > start else end
+    return ("…" if start else "") + text[start:end] + ("…" if end < len(text) else "")
+
+
+def has_term(text, terms):
+    folded = fold(text)
+    return any(re.search(r"\b" + re.escape(t[:max(3, len(t) - 2)]), folded) for t in terms)